@@ -1,33 +1,1104 @@
 """
 Business: Manage email subscriptions for users (subscribe/unsubscribe from notifications)
-Args: event with httpMethod, body (email, action, token); context with request_id
+Args: event with httpMethod, body (email, action, token), queryStringParameters (token for RFC 8058 one-click); context with request_id
 Returns: HTTP response with subscription status
 """
 import json
+import gzip
+import bisect
 import os
+import sys
+import time
+import math
+import threading
 import secrets
-from typing import Dict, Any
-import psycopg2
-from psycopg2.extras import RealDictCursor
+import hmac
+import hashlib
+import random
+import base64
+from urllib.parse import parse_qs
+from collections import OrderedDict
+from typing import Dict, Any, Iterator, List, Tuple, Optional
 
+# --- shared: settings (generated from scripts/shared/settings.py by scripts/sync_shared.py; edit there) ---
+CONNECTION_MAX_AGE = 300
+POOL_MAX_IDLE = int(os.environ.get('DB_POOL_MAX_IDLE', '4'))
+DEFAULT_DEADLINE_MS = int(os.environ.get('REQUEST_DEADLINE_MS', '10000'))
+DEADLINE_RESERVE_MS = 250
+CONNECT_TIMEOUT_MAX = 5
+STATEMENT_TIMEOUT_MAX_MS = 5000
+SMTP_TIMEOUT_MAX = 10
+BREAKER_FAILURE_THRESHOLD = 5
+BREAKER_RESET_SECONDS = 30
+METRICS_LOG = os.environ.get('METRICS_LOG', '1') != '0'
+MAX_FIELD_LENGTH = 255
+COMPRESSION_MIN_BYTES = int(os.environ.get('COMPRESSION_MIN_BYTES', '1024'))
+GZIP_LEVEL = int(os.environ.get('GZIP_LEVEL', '6'))
+BROTLI_QUALITY = int(os.environ.get('BROTLI_QUALITY', '5'))
+STREAM_MAX_SECONDS = int(os.environ.get('STREAM_MAX_SECONDS', '300'))
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+ADMISSION_MAX_ACTIVE = int(os.environ.get('ADMISSION_MAX_ACTIVE', '8'))
+ADMISSION_QUEUE_MAX = int(os.environ.get('ADMISSION_QUEUE_MAX', '16'))
+ADMISSION_WAIT_MS = int(os.environ.get('ADMISSION_WAIT_MS', '250'))
+ADMISSION_RETRY_AFTER_SECONDS = 1
+PRIORITY_NAMES = ('high', 'normal', 'low')
+CAPTURE_FILE = os.environ.get('CAPTURE_FILE')
+CAPTURE_SAMPLE_RATE = float(os.environ.get('CAPTURE_SAMPLE_RATE', '1'))
+# pseudonyms match across instances only if they share CAPTURE_SALT
+CAPTURE_SALT = os.environ.get('CAPTURE_SALT') or secrets.token_hex(16)
+CAPTURE_HEADERS = ('content-type', 'accept-encoding', 'if-none-match')
+# passwords, codes and the admin key are replaced by this; scripts/replay.py substitutes its own credentials
+CAPTURE_REDACTED = '<redacted>'
+# --- end shared: settings ---
 
-def generate_unsubscribe_token() -> str:
-    return secrets.token_urlsafe(48)
+HANDLER_NAME = 'subscriptions'
+MAX_BODY_BYTES = int(os.environ.get('MAX_BODY_BYTES', '2097152'))
+ACTIONS = ('subscribe', 'unsubscribe', 'status', 'status_batch', 'subscribe_batch', 'unsubscribe_batch')
+BATCH_MAX_ITEMS = 10000
+READ_ONLY_ACTIONS = ('status', 'status_batch')
+BATCH_ACTIONS = ('status_batch', 'subscribe_batch', 'unsubscribe_batch')
+# Admission priority by metrics action (PRIORITY_NAMES index); unlisted actions are 'normal'
+ACTION_PRIORITY: Dict[Any, int] = {
+    'warmup': 0, 'one_click': 0, 'unsubscribe': 0, 'status': 1,
+    'subscribe': 2, 'status_batch': 2, 'subscribe_batch': 2, 'unsubscribe_batch': 2
+}
+
+OPTIONS_RESPONSE: Dict[str, Any] = {
+    'statusCode': 200,
+    'headers': {
+        'Access-Control-Allow-Origin': '*',
+        'Access-Control-Allow-Methods': 'GET, POST, OPTIONS',
+        'Access-Control-Allow-Headers': 'Content-Type, X-Auth-Token, X-Min-LSN, X-Admin-Key',
+        'Access-Control-Max-Age': '86400'
+    },
+    'body': ''
+}
+
+ONE_CLICK_CONFIRM_HTML = '''<!doctype html>
+<html>
+  <body style="font-family: Arial, sans-serif; padding: 20px;">
+    <h2 style="color: #333;">Отписка от рассылки</h2>
+    <p>Нажмите кнопку, чтобы больше не получать письма от ruprojectgames.ru</p>
+    <form method="post">
+      <input type="hidden" name="List-Unsubscribe" value="One-Click">
+      <button type="submit">Отписаться</button>
+    </form>
+  </body>
+</html>
+'''
+
+QUERIES: Dict[str, str] = {
+    'user_id_by_email': "SELECT id FROM t_p68014762_remove_login_system.users WHERE email = %s",
+    'subscription_status': """SELECT id, subscribed_to_updates 
+        FROM t_p68014762_remove_login_system.users 
+        WHERE email = %s"""
+}
+
+BATCH_ITEMS_ERROR = f'Provide a non-empty list of up to {BATCH_MAX_ITEMS} items'
+BODY_SCHEMAS: Dict[str, Dict[str, Any]] = {
+    'subscribe': {'fields': {'email': str}, 'error': 'Email is required'},
+    'unsubscribe': {'fields': {'token': str, 'email': str}, 'required': 'any', 'error': 'Token or email is required'},
+    'status': {'fields': {'email': str}, 'error': 'Email is required'},
+    'status_batch': {'fields': {'emails': list}, 'max_items': BATCH_MAX_ITEMS, 'error': BATCH_ITEMS_ERROR},
+    'subscribe_batch': {'fields': {'emails': list}, 'max_items': BATCH_MAX_ITEMS, 'error': BATCH_ITEMS_ERROR},
+    'unsubscribe_batch': {'fields': {'emails': list, 'tokens': list}, 'required': 'any', 'max_items': BATCH_MAX_ITEMS, 'error': BATCH_ITEMS_ERROR}
+}
+
+
+# --- shared: runtime (generated from scripts/shared/runtime.py by scripts/sync_shared.py; edit there) ---
+def prepared_name(name: str) -> str:
+    # prefixed so a QUERIES key can never be an SQL keyword (PREPARE session_user is a syntax error)
+    return f'q_{name}'
+
+
+def compile_prepared(queries: Dict[str, str]) -> Dict[str, Tuple[str, str]]:
+    compiled = {}
+    for name, sql in queries.items():
+        parts = sql.split('%s')
+        positional = parts[0] + ''.join(f'${i}{part}' for i, part in enumerate(parts[1:], 1))
+        arguments = f" ({', '.join(['%s'] * (len(parts) - 1))})" if len(parts) > 1 else ''
+        statement = prepared_name(name)
+        compiled[name] = (f'PREPARE {statement} AS {positional}', f'EXECUTE {statement}{arguments}')
+    return compiled
+
+
+_PREPARED_QUERIES = compile_prepared(QUERIES)
+_idle_connections: Dict[str, List[Any]] = {}
+_connection_state: Dict[int, Dict[str, Any]] = {}
+_pool_lock = threading.Lock()
+_flights: Dict[Tuple, Dict[str, Any]] = {}
+_flights_lock = threading.Lock()
+
+
+class DependencyUnavailable(Exception):
+    pass
+
+
+class LoadShed(Exception):
+    pass
+
+
+_invocation = threading.local()
+_admission_cond = threading.Condition()
+_capture_lock = threading.Lock()
+_admission: Dict[str, Any] = {'active': 0, 'waiting': [0] * len(PRIORITY_NAMES)}
+_breakers: Dict[str, Dict[str, Any]] = {}
+_metrics_lock = threading.Lock()
+_counters: Dict[Tuple[str, ...], int] = {}
+_latency: Dict[str, List[float]] = {}
+# run after every handled response (in-process work such as batched writes)
+AFTER_RESPONSE_HOOKS: List[Any] = []
+
+
+def count_event(*key: str) -> None:
+    events = getattr(_invocation, 'events', None)
+    if events is None:
+        with _metrics_lock:
+            _counters[key] = _counters.get(key, 0) + 1
+    else:
+        events[key] = events.get(key, 0) + 1
+
+
+def observe_request(action: Any, events: Dict[Tuple[str, ...], int], status: int, duration_ms: float) -> None:
+    bucket = bisect.bisect_left(LATENCY_BUCKETS_MS, duration_ms)
+    with _metrics_lock:
+        for key, value in events.items():
+            _counters[key] = _counters.get(key, 0) + value
+        key = ('requests', action, str(status))
+        _counters[key] = _counters.get(key, 0) + 1
+        histogram = _latency.get(action)
+        if histogram is None:
+            histogram = _latency[action] = [0] * (len(LATENCY_BUCKETS_MS) + 1) + [0.0]
+        histogram[bucket] += 1
+        histogram[-1] += duration_ms
+    if METRICS_LOG:
+        print(json.dumps({
+            'metrics': HANDLER_NAME,
+            'action': action,
+            'status': status,
+            'duration_ms': round(duration_ms, 2),
+            'db_pool_idle': sum(len(idle) for idle in _idle_connections.values()),
+            'events': {'.'.join(key): value for key, value in events.items()}
+        }))
+
+
+def metrics_snapshot() -> Dict[str, Any]:
+    with _metrics_lock:
+        counters = dict(_counters)
+        latency = {action: list(histogram) for action, histogram in _latency.items()}
+    gauges = {
+        ('db_pool_idle',): sum(len(idle) for idle in _idle_connections.values()),
+        ('db_connections_open',): len(_connection_state)
+    }
+    with _admission_cond:
+        gauges[('admission_active',)] = _admission['active']
+        for priority, label in enumerate(PRIORITY_NAMES):
+            gauges[('admission_queue_depth', label)] = _admission['waiting'][priority]
+    for name, breaker in _breakers.items():
+        gauges[('breaker_open', name)] = int(breaker['opened_at'] is not None)
+    for key, shared in counters.items():
+        if key[0] == 'single_flight' and key[2] == 'shared':
+            total = shared + counters.get(('single_flight', key[1], 'leader'), 0)
+            gauges[('single_flight_coalescing_ratio', key[1])] = shared / total
+    return {
+        'handler': HANDLER_NAME,
+        'counters': counters,
+        'gauges': gauges,
+        'latency_buckets_ms': LATENCY_BUCKETS_MS,
+        'latency': latency
+    }
+
+
+def pseudonym(value: Any, kind: str) -> Any:
+    if not isinstance(value, str):
+        return value
+    normalized = value.strip().lower() if kind == 'email' else value
+    digest = hashlib.sha256(f'{CAPTURE_SALT}:{kind}:{normalized}'.encode()).hexdigest()
+    return f'u{digest[:16]}@replay.invalid' if kind == 'email' else digest[:43]
+
+
+def sanitize_body(body: str) -> str:
+    try:
+        data = json.loads(body) if body else None
+    except ValueError:
+        data = None
+    if not isinstance(data, dict):
+        return body if body == 'List-Unsubscribe=One-Click' else ''
+    for field, kind in (('email', 'email'), ('token', 'token')):
+        if field in data:
+            data[field] = pseudonym(data[field], kind)
+    for field, kind in (('emails', 'email'), ('tokens', 'token')):
+        if isinstance(data.get(field), list):
+            data[field] = [pseudonym(value, kind) for value in data[field]]
+    for field in ('password', 'code'):
+        if field in data:
+            data[field] = CAPTURE_REDACTED
+    return json.dumps(data)
+
+
+def sanitize_event(event: Dict[str, Any]) -> Dict[str, Any]:
+    headers = {}
+    for name, value in (event.get('headers') or {}).items():
+        lowered = name.lower()
+        if lowered == 'x-auth-token':
+            headers[name] = pseudonym(value, 'token')
+        elif lowered == 'x-admin-key':
+            headers[name] = CAPTURE_REDACTED
+        elif lowered in CAPTURE_HEADERS:
+            headers[name] = value
+    query = {
+        name: pseudonym(value, 'token') if name == 'token' else value
+        for name, value in (event.get('queryStringParameters') or {}).items()
+    }
+    body = event.get('body') or ''
+    if body and event.get('isBase64Encoded'):
+        body = base64.b64decode(body).decode('utf-8', 'replace')
+    sanitized = {
+        'httpMethod': event.get('httpMethod', 'GET'),
+        'headers': headers,
+        'queryStringParameters': query,
+        'body': sanitize_body(body),
+        'isBase64Encoded': False
+    }
+    if event.get('warmup'):
+        sanitized['warmup'] = True
+    return sanitized
+
+
+def capture_invocation(event: Dict[str, Any], status: int, duration_ms: float) -> None:
+    if CAPTURE_SAMPLE_RATE < 1 and random.random() >= CAPTURE_SAMPLE_RATE:
+        return
+    record = {
+        'handler': HANDLER_NAME,
+        'at': round(time.time() - duration_ms / 1000, 6),
+        'duration_ms': round(duration_ms, 3),
+        'status': status,
+        'event': sanitize_event(event)
+    }
+    line = json.dumps(record, separators=(',', ':')) + '\n'
+    try:
+        with _capture_lock, open(CAPTURE_FILE, 'a', encoding='utf-8') as target:
+            target.write(line)
+    except OSError as e:
+        print(f'Capture write error: {e}')
+
+
+def invocation_budget_ms(context: Any) -> float:
+    get_remaining = getattr(context, 'get_remaining_time_in_millis', None)
+    budget = get_remaining() if callable(get_remaining) else DEFAULT_DEADLINE_MS
+    return budget - DEADLINE_RESERVE_MS
+
+
+def remaining_seconds() -> float:
+    deadline = getattr(_invocation, 'deadline', None)
+    if deadline is None:
+        return DEFAULT_DEADLINE_MS / 1000
+    remaining = deadline - time.monotonic()
+    if remaining <= 0:
+        raise DependencyUnavailable('Request deadline exceeded')
+    return remaining
+
+
+def breaker_allows(name: str) -> bool:
+    breaker = _breakers.get(name)
+    if not breaker or breaker['opened_at'] is None:
+        return True
+    if time.monotonic() - breaker['opened_at'] < BREAKER_RESET_SECONDS:
+        return False
+    breaker['opened_at'] = time.monotonic()
+    return True
+
+
+def record_failure(name: str) -> None:
+    breaker = _breakers.setdefault(name, {'failures': 0, 'opened_at': None})
+    breaker['failures'] += 1
+    if breaker['failures'] >= BREAKER_FAILURE_THRESHOLD:
+        if breaker['opened_at'] is None:
+            print(f'Circuit breaker opened: {name}')
+            count_event('breaker_opened', name)
+        breaker['opened_at'] = time.monotonic()
+
+
+def record_success(name: str) -> None:
+    breaker = _breakers.get(name)
+    if breaker and (breaker['failures'] or breaker['opened_at'] is not None):
+        breaker['failures'] = 0
+        breaker['opened_at'] = None
+
+
+def is_database_error(error: Exception) -> bool:
+    psycopg2 = sys.modules.get('psycopg2')
+    return psycopg2 is not None and isinstance(error, psycopg2.OperationalError)
+
+
+def unavailable_response(message: str, retry_after: int = BREAKER_RESET_SECONDS) -> Dict[str, Any]:
+    return {
+        'statusCode': 503,
+        'headers': {
+            'Content-Type': 'application/json',
+            'Access-Control-Allow-Origin': '*',
+            'Retry-After': str(retry_after)
+        },
+        'isBase64Encoded': False,
+        'body': json.dumps({'error': message})
+    }
+
+
+def admit() -> None:
+    priority = ACTION_PRIORITY.get(getattr(_invocation, 'action', None), 1)
+    label = PRIORITY_NAMES[priority]
+    with _admission_cond:
+        waiting = _admission['waiting']
+        if _admission['active'] < ADMISSION_MAX_ACTIVE and not any(waiting[:priority + 1]):
+            _admission['active'] += 1
+            _invocation.admitted = True
+            return
+        # lower priorities may only fill part of the queue (all / 2/3 / 1/3), so they are shed first
+        limit = ADMISSION_QUEUE_MAX * (len(PRIORITY_NAMES) - priority) // len(PRIORITY_NAMES)
+        if sum(waiting) >= limit:
+            count_event('admission', 'shed', label)
+            raise LoadShed('Server busy, retry shortly')
+        waiting[priority] += 1
+        count_event('admission', 'queued', label)
+        try:
+            wait_until = time.monotonic() + min(ADMISSION_WAIT_MS / 1000, remaining_seconds())
+            while _admission['active'] >= ADMISSION_MAX_ACTIVE or any(waiting[:priority]):
+                timeout = wait_until - time.monotonic()
+                if timeout <= 0:
+                    count_event('admission', 'shed', label)
+                    raise LoadShed('Server busy, retry shortly')
+                _admission_cond.wait(timeout)
+        finally:
+            waiting[priority] -= 1
+            _admission_cond.notify_all()
+        _admission['active'] += 1
+        _invocation.admitted = True
+
+
+def release_admission() -> None:
+    if getattr(_invocation, 'admitted', None):
+        release_slot()
+    _invocation.admitted = None
+
+
+def release_slot() -> None:
+    with _admission_cond:
+        _admission['active'] -= 1
+        _admission_cond.notify_all()
+
+
+def get_connection(database_url: str, breaker: str = 'db') -> Any:
+    if not breaker_allows(breaker):
+        raise DependencyUnavailable('Database unavailable')
+    if getattr(_invocation, 'admitted', None) is False:
+        admit()
+    remaining = remaining_seconds()
+    statement_timeout_ms = int(max(100, min(STATEMENT_TIMEOUT_MAX_MS, remaining * 1000)))
+    with _pool_lock:
+        idle = _idle_connections.get(database_url, [])
+        while idle:
+            conn = idle.pop()
+            state = _connection_state.get(id(conn))
+            if state and not conn.closed and time.monotonic() - state['opened_at'] < CONNECTION_MAX_AGE:
+                state['uses'] += 1
+                count_event('db_connections', 'reused')
+                break
+            discard_connection(conn)
+        else:
+            conn = None
+    breakers_used = getattr(_invocation, 'breakers_used', None)
+    if breakers_used is not None:
+        breakers_used.add(breaker)
+    if conn is not None:
+        track_connection(conn)
+        if state['statement_timeout_ms'] != statement_timeout_ms:
+            conn.autocommit = True
+            conn.cursor().execute('SET statement_timeout = %s', (statement_timeout_ms,))
+            conn.autocommit = False
+            state['statement_timeout_ms'] = statement_timeout_ms
+        return conn
+    import psycopg2
+    from psycopg2.extras import RealDictCursor
+    try:
+        conn = psycopg2.connect(
+            database_url,
+            cursor_factory=RealDictCursor,
+            connect_timeout=max(1, min(CONNECT_TIMEOUT_MAX, int(remaining))),
+            options=f'-c statement_timeout={statement_timeout_ms}'
+        )
+    except psycopg2.OperationalError as e:
+        record_failure(breaker)
+        count_event('db_connections', 'failed')
+        print(f'Database connection error ({breaker}): {e}')
+        raise DependencyUnavailable('Database unavailable')
+    if breakers_used is None:
+        # outside an invocation (background refresh) nothing else reports the outcome
+        record_success(breaker)
+    count_event('db_connections', 'opened')
+    with _pool_lock:
+        _connection_state[id(conn)] = {
+            'url': database_url,
+            'opened_at': time.monotonic(),
+            'uses': 1,
+            'prepared': set(),
+            'statement_timeout_ms': statement_timeout_ms,
+            'breaker': breaker
+        }
+    track_connection(conn)
+    return conn
+
+
+def track_connection(conn: Any) -> None:
+    connections = getattr(_invocation, 'connections', None)
+    if connections is not None:
+        connections.append(conn)
+
+
+def abandon_connections() -> str:
+    # connections still checked out when _handle raised; the newest one is where the query failed
+    connections = getattr(_invocation, 'connections', None) or []
+    state = _connection_state.get(id(connections[-1])) if connections else None
+    while connections:
+        discard_connection(connections.pop())
+    return state['breaker'] if state else 'db'
+
+
+def discard_connection(conn: Any) -> None:
+    _connection_state.pop(id(conn), None)
+    count_event('db_connections', 'closed')
+    if not conn.closed:
+        conn.close()
+
+
+def release_connection(conn: Any) -> None:
+    connections = getattr(_invocation, 'connections', None)
+    if connections and conn in connections:
+        connections.remove(conn)
+    if not conn.closed:
+        try:
+            conn.rollback()
+        except Exception:
+            conn.close()
+    with _pool_lock:
+        state = _connection_state.get(id(conn))
+        idle = _idle_connections.setdefault(state['url'], []) if state else []
+        if conn.closed or not state or len(idle) >= POOL_MAX_IDLE:
+            discard_connection(conn)
+        else:
+            idle.append(conn)
+
+
+def execute_query(cursor: Any, name: str, params: Tuple = ()) -> None:
+    state = _connection_state.get(id(cursor.connection))
+    if state is None or (state['uses'] < 2 and not state['prepared']):
+        count_event('cache', 'prepared', 'miss')
+        cursor.execute(QUERIES[name], params)
+        return
+    prepare_sql, execute_sql = _PREPARED_QUERIES[name]
+    if name in state['prepared']:
+        count_event('cache', 'prepared', 'hit')
+    else:
+        count_event('cache', 'prepared', 'miss')
+        cursor.execute(prepare_sql)
+        state['prepared'].add(name)
+    cursor.execute(execute_sql, params)
+
+
+def fetch_one_shared(cursor: Any, name: str, params: Tuple) -> Any:
+    state = _connection_state.get(id(cursor.connection))
+    key = (state['url'] if state else None, QUERIES[name], params)
+    with _flights_lock:
+        flight = _flights.get(key)
+        leader = flight is None
+        if leader:
+            flight = _flights[key] = {'done': threading.Event(), 'row': None, 'failed': False}
+    if not leader:
+        if flight['done'].wait(remaining_seconds()) and not flight['failed']:
+            count_event('single_flight', name, 'shared')
+            return dict(flight['row']) if flight['row'] is not None else None
+        execute_query(cursor, name, params)
+        return cursor.fetchone()
+    count_event('single_flight', name, 'leader')
+    try:
+        execute_query(cursor, name, params)
+        flight['row'] = cursor.fetchone()
+    except Exception:
+        flight['failed'] = True
+        raise
+    finally:
+        with _flights_lock:
+            _flights.pop(key, None)
+        flight['done'].set()
+    return flight['row']
+
+
+def prepare_all(conn: Any) -> None:
+    state = _connection_state[id(conn)]
+    cursor = conn.cursor()
+    for name, (prepare_sql, _) in _PREPARED_QUERIES.items():
+        if name not in state['prepared']:
+            cursor.execute(prepare_sql)
+            state['prepared'].add(name)
+    cursor.close()
+    conn.commit()
+
+
+def reject_constant(name: str) -> None:
+    raise ValueError(f'Unsupported JSON constant {name}')
+
+
+_decode_json = json.JSONDecoder(parse_constant=reject_constant).decode
+
+
+def reject_request(status: int, message: str) -> Dict[str, Any]:
+    count_event('validation', 'rejected')
+    return {
+        'statusCode': status,
+        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+        'isBase64Encoded': False,
+        'body': json.dumps({'error': message})
+    }
+
+
+def decode_body(event: Dict[str, Any]) -> Tuple[Dict[str, Any], Optional[Dict[str, Any]]]:
+    body = event.get('body') or '{}'
+    if len(body) > MAX_BODY_BYTES or (len(body) * 4 > MAX_BODY_BYTES and len(body.encode('utf-8')) > MAX_BODY_BYTES):
+        return {}, reject_request(413, 'Request body too large')
+    try:
+        data = _decode_json(body)
+    except ValueError:
+        return {}, reject_request(400, 'Invalid JSON body')
+    if not isinstance(data, dict):
+        return {}, reject_request(400, 'Request body must be a JSON object')
+    return data, None
+
+
+def compile_check(check: Tuple) -> Any:
+    kind, field, argument, message = check
+    if kind == 'min_length':
+        return lambda body: message if len(body[field]) < argument else None
+    if kind == 'differs':
+        return lambda body: message if body[field].lower() == body[argument].lower() else None
+    if kind == 'positive':
+        return lambda body: message if body[field] <= 0 else None
+    if kind == 'below':
+        return lambda body: message if body[field] >= argument else None
+    if kind == 'decimals':
+        return lambda body: message if round(body[field], argument) != body[field] else None
+    raise ValueError(f'Unknown check {kind}')
+
+
+def parse_batch_items(value: Any, max_items: int) -> Optional[List[str]]:
+    if not isinstance(value, list) or len(value) > max_items:
+        return None
+    if not all(isinstance(item, str) and len(item) <= MAX_FIELD_LENGTH for item in value):
+        return None
+    return list(dict.fromkeys(item.strip() for item in value if item.strip()))
+
+
+def compile_schema(schema: Dict[str, Any]) -> Any:
+    fields = tuple(schema['fields'].items())
+    require_all = schema.get('required', 'all') == 'all'
+    error = schema['error']
+    max_items = schema.get('max_items', 0)
+    checks = tuple(compile_check(check) for check in schema.get('checks', ()))
+
+    def validate(body: Dict[str, Any]) -> Optional[str]:
+        present = 0
+        for name, kind in fields:
+            value = body.get(name)
+            if value is None:
+                if require_all:
+                    return error
+                continue
+            if kind is str:
+                if not isinstance(value, str):
+                    return error
+                if len(value) > MAX_FIELD_LENGTH:
+                    return f'{name.capitalize()} must be at most {MAX_FIELD_LENGTH} characters'
+                value = value.strip()
+            elif kind is float:
+                if isinstance(value, bool) or not isinstance(value, (int, float)):
+                    return error
+            elif kind is list:
+                value = parse_batch_items(value, max_items)
+                if value is None:
+                    return error
+            body[name] = value
+            if value or kind is float:
+                present += 1
+            elif require_all:
+                return error
+        if not present:
+            return error
+        for check in checks:
+            message = check(body)
+            if message:
+                return message
+        return None
+
+    return validate
+
+
+_BODY_VALIDATORS = {action: compile_schema(schema) for action, schema in BODY_SCHEMAS.items()}
+
+
+def validate_body(action: Any, data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    validate = _BODY_VALIDATORS.get(action) if isinstance(action, str) else None
+    if validate is None:
+        return reject_request(405, 'Method not allowed')
+    message = validate(data)
+    return reject_request(400, message) if message else None
+
+
+def brotli_module() -> Any:
+    try:
+        import brotli
+    except ImportError:
+        return None
+    return brotli
+
+
+def choose_encoding(event: Dict[str, Any]) -> Optional[str]:
+    headers = event.get('headers') or {}
+    accept = headers.get('Accept-Encoding') or headers.get('accept-encoding') or ''
+    weights: Dict[str, float] = {}
+    for item in accept.split(','):
+        coding, _, params = item.strip().partition(';')
+        quality = 1.0
+        if params.strip().startswith('q='):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                quality = 0.0
+        weights[coding.strip().lower()] = quality
+    wildcard = weights.get('*', 0.0)
+    if weights.get('br', wildcard) > 0 and brotli_module() is not None:
+        return 'br'
+    if weights.get('gzip', wildcard) > 0:
+        return 'gzip'
+    return None
+
+
+# A compressed body is a different representation from the identity one, so its strong ETag gets the coding
+# as a suffix ("abc" -> "abc-gzip"); etag_matches strips it again when the tag comes back in If-None-Match
+ETAG_CODINGS = ('br', 'gzip')
+
+
+def coded_etag(etag: str, encoding: str) -> str:
+    if etag.startswith('W/') or not etag.endswith('"'):
+        return etag
+    return f'{etag[:-1]}-{encoding}"'
+
+
+def compress_response(event: Dict[str, Any], response: Dict[str, Any]) -> Dict[str, Any]:
+    body = response.get('body')
+    if response.get('isBase64Encoded') or not isinstance(body, str) or len(body) < COMPRESSION_MIN_BYTES:
+        return response
+    headers = dict(response.get('headers') or {})
+    headers['Vary'] = f"{headers['Vary']}, Accept-Encoding" if headers.get('Vary') else 'Accept-Encoding'
+    encoding = choose_encoding(event)
+    if encoding is None:
+        return {**response, 'headers': headers}
+    data = body.encode('utf-8')
+    if encoding == 'br':
+        compressed = brotli_module().compress(data, quality=BROTLI_QUALITY)
+    else:
+        compressed = gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+    if len(compressed) >= len(data):
+        return {**response, 'headers': headers}
+    count_event('compression', encoding)
+    headers['Content-Encoding'] = encoding
+    if headers.get('ETag'):
+        headers['ETag'] = coded_etag(headers['ETag'], encoding)
+    return {**response, 'headers': headers, 'isBase64Encoded': True, 'body': base64.b64encode(compressed).decode('ascii')}
+
+
+# A streamed body ('bodyChunks') is produced after handler() has returned: it keeps the admission slot and
+# defers the request metrics until close() (end of body, error or consumer gone), and is cut off after
+# STREAM_MAX_SECONDS
+class StreamedBody:
+    def __init__(self, chunks: Iterator[str]) -> None:
+        self.chunks = chunks
+        self.deadline = time.monotonic() + STREAM_MAX_SECONDS
+        self.on_close: List[Any] = []
+        self.closed = False
+
+    def __iter__(self) -> 'StreamedBody':
+        return self
+
+    def __next__(self) -> str:
+        if self.closed:
+            raise StopIteration
+        try:
+            if time.monotonic() > self.deadline:
+                raise DependencyUnavailable(f'Response stream exceeded {STREAM_MAX_SECONDS}s')
+            return next(self.chunks)
+        except BaseException:
+            self.close()
+            raise
+
+    def close(self) -> None:
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            close = getattr(self.chunks, 'close', None)
+            if close:
+                close()
+        finally:
+            for callback in self.on_close:
+                callback()
+
+    __del__ = close
+
+
+def finish_invocation(event: Dict[str, Any], action: Any, events: Dict[Tuple[str, ...], int], status: int,
+                      started: float) -> None:
+    duration_ms = (time.perf_counter() - started) * 1000
+    observe_request(action, events, status, duration_ms)
+    if CAPTURE_FILE:
+        capture_invocation(event, status, duration_ms)
 
 
 def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    started = time.perf_counter()
+    _invocation.action = 'warmup' if event.get('warmup') else str(event.get('httpMethod', 'GET')).lower()
+    _invocation.events = {}
+    status = 500
+    stream = None
+    try:
+        response = compress_response(event, _handle_with_deadline(event, context))
+        status = response['statusCode']
+        stream = response.get('bodyChunks')
+        return response
+    finally:
+        action, events = _invocation.action, _invocation.events
+        _invocation.events = None
+        if stream is not None:
+            stream.on_close.append(lambda: finish_invocation(event, action, events, status, started))
+        else:
+            finish_invocation(event, action, events, status, started)
+
+
+def _handle_with_deadline(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    _invocation.deadline = time.monotonic() + invocation_budget_ms(context) / 1000
+    # breakers whose connections served this invocation; they are reset only if it succeeds, so failing
+    # queries on freshly opened connections still add up
+    _invocation.breakers_used = set()
+    _invocation.admitted = False
+    _invocation.connections = []
+    _invocation.replica_failed = False
+    try:
+        response = _handle_with_fallback(event, context)
+        if response.get('bodyChunks') is not None:
+            stream = response['bodyChunks']
+            if not isinstance(stream, StreamedBody):
+                stream = response['bodyChunks'] = StreamedBody(stream)
+            if _invocation.admitted:
+                # the slot is held until the body has been sent
+                stream.on_close.append(release_slot)
+                _invocation.admitted = None
+    except LoadShed as e:
+        abandon_connections()
+        return unavailable_response(str(e), ADMISSION_RETRY_AFTER_SECONDS)
+    except DependencyUnavailable as e:
+        abandon_connections()
+        return unavailable_response(str(e))
+    except Exception as e:
+        breaker = abandon_connections()
+        if not is_database_error(e):
+            raise
+        record_failure(breaker)
+        print(f'Database error ({breaker}): {e}')
+        return unavailable_response('Database unavailable')
+    finally:
+        _invocation.deadline = None
+        release_admission()
+    for name in _invocation.breakers_used:
+        record_success(name)
+    for hook in AFTER_RESPONSE_HOOKS:
+        hook()
+    return response
+
+
+def _handle_with_fallback(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    try:
+        return _handle(event, context)
+    except Exception as e:
+        if not is_database_error(e) or getattr(_invocation, 'replica_failed', True):
+            raise
+        connections = _invocation.connections
+        state = _connection_state.get(id(connections[-1])) if connections else None
+        if not state or state['breaker'] != 'replica':
+            raise
+        abandon_connections()
+        _invocation.breakers_used.discard('replica')
+        record_failure('replica')
+        count_event('db_reads', 'replica_failed')
+        print(f'Replica error, retrying on the primary: {e}')
+        _invocation.replica_failed = True
+    return _handle(event, context)
+# --- end shared: runtime ---
+
+
+# --- shared: actions (generated from scripts/shared/actions.py by scripts/sync_shared.py; edit there) ---
+def set_action(action: Any) -> None:
+    _invocation.action = action if action in ACTIONS else 'unknown'
+# --- end shared: actions ---
+
+
+# --- shared: replica (generated from scripts/shared/replica.py by scripts/sync_shared.py; edit there) ---
+REPLICA_MAX_WAIT_MS = int(os.environ.get('REPLICA_MAX_WAIT_MS', '200'))
+
+
+def get_read_connection(database_url: str, event: Dict[str, Any]) -> Tuple[Any, bool]:
+    replica_url = os.environ.get('DATABASE_REPLICA_URL')
+    if not replica_url or getattr(_invocation, 'replica_failed', False):
+        return get_connection(database_url), False
+    try:
+        conn = get_connection(replica_url, breaker='replica')
+    except DependencyUnavailable:
+        return get_connection(database_url), False
+    min_lsn = (event.get('headers') or {}).get('X-Min-LSN')
+    if not min_lsn or replica_caught_up(conn, min_lsn):
+        count_event('db_reads', 'replica')
+        return conn, True
+    count_event('db_reads', 'replica_lagging')
+    release_connection(conn)
+    return get_connection(database_url), False
+
+
+def replica_caught_up(conn: Any, min_lsn: str) -> bool:
+    deadline = time.monotonic() + REPLICA_MAX_WAIT_MS / 1000
+    cursor = conn.cursor()
+    try:
+        while True:
+            cursor.execute("SELECT pg_last_wal_replay_lsn() >= %s::pg_lsn AS caught_up", (min_lsn,))
+            if cursor.fetchone()['caught_up']:
+                return True
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.01)
+    except Exception:
+        conn.rollback()
+        return False
+    finally:
+        cursor.close()
+
+
+def write_lsn_headers(cursor: Any) -> Dict[str, str]:
+    if not os.environ.get('DATABASE_REPLICA_URL'):
+        return {}
+    cursor.execute("SELECT pg_current_wal_lsn()::text AS lsn")
+    return {'X-Write-LSN': cursor.fetchone()['lsn'], 'Access-Control-Expose-Headers': 'X-Write-LSN'}
+# --- end shared: replica ---
+
+
+# --- shared: email_filter (generated from scripts/shared/email_filter.py by scripts/sync_shared.py; edit there) ---
+NEGATIVE_CACHE_SIZE = int(os.environ.get('NEGATIVE_CACHE_SIZE', '10000'))
+NEGATIVE_CACHE_TTL_SECONDS = int(os.environ.get('NEGATIVE_CACHE_TTL_SECONDS', '60'))
+EMAIL_BLOOM_BYTES = int(os.environ.get('EMAIL_BLOOM_BYTES', '0'))
+EMAIL_BLOOM_FP_RATE = float(os.environ.get('EMAIL_BLOOM_FP_RATE', '0.01'))
+EMAIL_BLOOM_REFRESH_SECONDS = int(os.environ.get('EMAIL_BLOOM_REFRESH_SECONDS', '60'))
+_missing_emails: Dict[str, float] = OrderedDict()
+_missing_lock = threading.Lock()
+_email_bloom: Dict[str, Any] = {
+    'bits': None,
+    'size': EMAIL_BLOOM_BYTES * 8,
+    'hashes': max(1, round(-math.log2(EMAIL_BLOOM_FP_RATE))),
+    'capacity': int(EMAIL_BLOOM_BYTES * 8 * math.log(2) ** 2 / -math.log(EMAIL_BLOOM_FP_RATE)),
+    'count': 0,
+    'watermark': 0,
+    'refreshed_at': 0.0,
+    'refreshing': False
+}
+
+
+def bloom_positions(email: str) -> List[int]:
+    digest = hashlib.blake2b(email.encode(), digest_size=16).digest()
+    h1 = int.from_bytes(digest[:8], 'little')
+    h2 = int.from_bytes(digest[8:], 'little') | 1
+    size = _email_bloom['size']
+    return [(h1 + i * h2) % size for i in range(_email_bloom['hashes'])]
+
+
+def bloom_add(bits: bytearray, email: str) -> None:
+    for position in bloom_positions(email):
+        bits[position >> 3] |= 1 << (position & 7)
+
+
+def refresh_email_bloom() -> None:
+    try:
+        bits = _email_bloom['bits']
+        rebuild = bits is None
+        if rebuild:
+            bits = bytearray(EMAIL_BLOOM_BYTES)
+        watermark, added = _email_bloom['watermark'], 0
+        conn = get_connection(os.environ['DATABASE_URL'])
+        try:
+            cursor = conn.cursor(name='email_bloom')
+            cursor.itersize = 50000
+            cursor.execute(
+                "SELECT id, email FROM t_p68014762_remove_login_system.users WHERE id > %s",
+                (watermark,)
+            )
+            for row in cursor:
+                bloom_add(bits, row['email'])
+                watermark = max(watermark, row['id'])
+                added += 1
+            cursor.close()
+        finally:
+            release_connection(conn)
+        _email_bloom.update(bits=bits, watermark=watermark, count=_email_bloom['count'] + added,
+                            refreshed_at=time.monotonic())
+        if _email_bloom['count'] > _email_bloom['capacity']:
+            print(f"Email bloom filter over capacity ({_email_bloom['count']} > {_email_bloom['capacity']}), "
+                  'false-positive rate exceeds EMAIL_BLOOM_FP_RATE')
+    except Exception as e:
+        print(f'Email bloom refresh error: {e}')
+    finally:
+        _email_bloom['refreshing'] = False
+
+
+def bloom_excludes(email: str) -> bool:
+    if not EMAIL_BLOOM_BYTES:
+        return False
+    if not _email_bloom['refreshing'] and time.monotonic() - _email_bloom['refreshed_at'] > EMAIL_BLOOM_REFRESH_SECONDS:
+        _email_bloom['refreshing'] = True
+        threading.Thread(target=refresh_email_bloom, daemon=True).start()
+    bits = _email_bloom['bits']
+    # emails registered by other instances since the last refresh are not in the filter; once it is older
+    # than the negative cache would trust an answer, ask the database instead
+    if bits is None or time.monotonic() - _email_bloom['refreshed_at'] > NEGATIVE_CACHE_TTL_SECONDS:
+        return False
+    return not all(bits[position >> 3] & (1 << (position & 7)) for position in bloom_positions(email))
+
+
+def email_registered(email: str) -> bool:
+    conn = get_connection(os.environ['DATABASE_URL'])
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT 1 FROM t_p68014762_remove_login_system.users WHERE email = %s", (email,))
+        found = cursor.fetchone() is not None
+        cursor.close()
+    finally:
+        release_connection(conn)
+    return found
+
+
+def email_known_missing(email: str) -> bool:
+    if not email:
+        return False
+    cache = None
+    with _missing_lock:
+        expires_at = _missing_emails.get(email)
+        if expires_at is not None:
+            if expires_at > time.monotonic():
+                _missing_emails.move_to_end(email)
+                cache = 'negative_email'
+            else:
+                del _missing_emails[email]
+    if cache is None and bloom_excludes(email):
+        cache = 'email_bloom'
+    if cache is None:
+        count_event('cache', 'negative_email', 'miss')
+        return False
+    # a registration handled by another function instance does not reach this cache, so a negative answer
+    # is confirmed on the primary (one indexed lookup, no replica or action work) before it becomes a 404
+    if email_registered(email):
+        count_event('cache', cache, 'stale')
+        note_registered_email(email)
+        return False
+    count_event('cache', cache, 'hit')
+    return True
+
+
+def remember_missing_email(email: str) -> None:
+    with _missing_lock:
+        _missing_emails[email] = time.monotonic() + NEGATIVE_CACHE_TTL_SECONDS
+        _missing_emails.move_to_end(email)
+        while len(_missing_emails) > NEGATIVE_CACHE_SIZE:
+            _missing_emails.popitem(last=False)
+
+
+def note_registered_email(email: str) -> None:
+    with _missing_lock:
+        _missing_emails.pop(email, None)
+    if _email_bloom['bits'] is not None:
+        bloom_add(_email_bloom['bits'], email)
+# --- end shared: email_filter ---
+
+
+# --- shared: unsubscribe (generated from scripts/shared/unsubscribe.py by scripts/sync_shared.py; edit there) ---
+UNSUBSCRIBE_SECRET = os.environ.get('UNSUBSCRIBE_SECRET', '')
+if not UNSUBSCRIBE_SECRET:
+    # without it no token can be issued or checked, and every user would silently lose one-click unsubscribe
+    raise RuntimeError('UNSUBSCRIBE_SECRET is not set; it is required to issue and check unsubscribe tokens')
+
+
+def unsubscribe_token(user_id: int) -> str:
+    # derived from the user id rather than random, so it can be handed out again without rotating it;
+    # only its sha256 is stored (users.unsubscribe_token_hash)
+    digest = hmac.new(UNSUBSCRIBE_SECRET.encode(), f'unsubscribe:{user_id}'.encode(), hashlib.sha256).digest()
+    return base64.urlsafe_b64encode(digest).rstrip(b'=').decode('ascii')
+
+
+def hash_unsubscribe_token(token: Optional[str]) -> Optional[str]:
+    return hashlib.sha256(token.encode()).hexdigest() if token else None
+# --- end shared: unsubscribe ---
+
+
+def warmup() -> Dict[str, Any]:
+    started = time.perf_counter()
+    database_url = os.environ.get('DATABASE_URL')
+    for url in (database_url, os.environ.get('DATABASE_REPLICA_URL')):
+        if url and not _idle_connections.get(url):
+            conn = get_connection(url)
+            prepare_all(conn)
+            release_connection(conn)
+    return {
+        'warm': True,
+        'connection': any(_idle_connections.values()),
+        'duration_ms': round((time.perf_counter() - started) * 1000, 2)
+    }
+
+
+def is_one_click_body(event: Dict[str, Any]) -> bool:
+    body = event.get('body') or ''
+    if event.get('isBase64Encoded'):
+        body = base64.b64decode(body).decode('utf-8', 'replace')
+    return parse_qs(body).get('List-Unsubscribe') == ['One-Click']
+
+
+def is_admin_request(event: Dict[str, Any]) -> bool:
+    admin_key = os.environ.get('ADMIN_API_KEY')
+    provided = (event.get('headers') or {}).get('X-Admin-Key', '')
+    return bool(admin_key) and hmac.compare_digest(provided.encode(), admin_key.encode())
+
+
+def _handle(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     method: str = event.get('httpMethod', 'GET')
     
+    if event.get('warmup'):
+        return {
+            'statusCode': 200,
+            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+            'isBase64Encoded': False,
+            'body': json.dumps(warmup())
+        }
+    
     if method == 'OPTIONS':
+        return dict(OPTIONS_RESPONSE)
+    
+    one_click_token = ((event.get('queryStringParameters') or {}).get('token') or '').strip()
+    
+    if method == 'GET' and one_click_token:
         return {
             'statusCode': 200,
-            'headers': {
-                'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Methods': 'GET, POST, OPTIONS',
-                'Access-Control-Allow-Headers': 'Content-Type, X-Auth-Token',
-                'Access-Control-Max-Age': '86400'
-            },
-            'body': ''
+            'headers': {'Content-Type': 'text/html; charset=utf-8', 'Access-Control-Allow-Origin': '*'},
+            'isBase64Encoded': False,
+            'body': ONE_CLICK_CONFIRM_HTML
         }
     
     database_url = os.environ.get('DATABASE_URL')
@@ -39,35 +1110,65 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             'body': json.dumps({'error': 'Database connection not configured'})
         }
     
-    conn = psycopg2.connect(database_url)
-    cursor = conn.cursor(cursor_factory=RealDictCursor)
+    one_click = method == 'POST' and bool(one_click_token) and is_one_click_body(event)
+    body_data: Dict[str, Any] = {}
+    if method == 'POST' and not one_click:
+        body_data, rejection = decode_body(event)
+        set_action(body_data.get('action'))
+        if not rejection and body_data.get('action') in BATCH_ACTIONS and not is_admin_request(event):
+            rejection = reject_request(403, 'Admin key required')
+        rejection = rejection or validate_body(body_data.get('action'), body_data)
+        if rejection:
+            return rejection
+    action = body_data.get('action')
+    if one_click:
+        _invocation.action = 'one_click'
     
-    if method == 'POST':
-        body_data = json.loads(event.get('body', '{}'))
-        action = body_data.get('action')
+    if action in ('subscribe', 'status') and email_known_missing(body_data['email']):
+        return {
+            'statusCode': 404,
+            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+            'isBase64Encoded': False,
+            'body': json.dumps({'error': 'User not found'})
+        }
+    
+    if action in READ_ONLY_ACTIONS:
+        conn, on_replica = get_read_connection(database_url, event)
+    else:
+        conn, on_replica = get_connection(database_url), False
+    cursor = conn.cursor()
+    
+    if one_click:
+        cursor.execute(
+            """UPDATE t_p68014762_remove_login_system.users 
+               SET subscribed_to_updates = FALSE 
+               WHERE unsubscribe_token_hash = %s""",
+            (hash_unsubscribe_token(one_click_token),)
+        )
+        conn.commit()
+        found = cursor.rowcount > 0
         
+        cursor.close()
+        release_connection(conn)
+        
+        return {
+            'statusCode': 200 if found else 404,
+            'headers': {'Content-Type': 'text/plain; charset=utf-8', 'Access-Control-Allow-Origin': '*'},
+            'isBase64Encoded': False,
+            'body': 'Unsubscribed' if found else 'Subscription not found'
+        }
+    
+    if method == 'POST':
         if action == 'subscribe':
-            email = body_data.get('email', '').strip()
+            email = body_data['email']
             
-            if not email:
-                cursor.close()
-                conn.close()
-                return {
-                    'statusCode': 400,
-                    'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                    'isBase64Encoded': False,
-                    'body': json.dumps({'error': 'Email is required'})
-                }
-            
-            cursor.execute(
-                "SELECT id FROM t_p68014762_remove_login_system.users WHERE email = %s",
-                (email,)
-            )
+            execute_query(cursor, 'user_id_by_email', (email,))
             user = cursor.fetchone()
             
             if not user:
+                remember_missing_email(email)
                 cursor.close()
-                conn.close()
+                release_connection(conn)
                 return {
                     'statusCode': 404,
                     'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
@@ -75,49 +1176,41 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                     'body': json.dumps({'error': 'User not found'})
                 }
             
-            unsubscribe_token = generate_unsubscribe_token()
+            token = unsubscribe_token(user['id'])
             
             cursor.execute(
                 """UPDATE t_p68014762_remove_login_system.users 
-                   SET subscribed_to_updates = TRUE, unsubscribe_token = %s 
-                   WHERE email = %s""",
-                (unsubscribe_token, email)
+                   SET subscribed_to_updates = TRUE, unsubscribe_token_hash = %s 
+                   WHERE id = %s""",
+                (hash_unsubscribe_token(token), user['id'])
             )
             conn.commit()
+            lsn_headers = write_lsn_headers(cursor)
             
             cursor.close()
-            conn.close()
+            release_connection(conn)
             
             return {
                 'statusCode': 200,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*', **lsn_headers},
                 'isBase64Encoded': False,
                 'body': json.dumps({
                     'message': 'Successfully subscribed to updates',
-                    'subscribed': True
+                    'subscribed': True,
+                    'unsubscribe_token': token
                 })
             }
         
         elif action == 'unsubscribe':
-            token = body_data.get('token', '').strip()
-            email = body_data.get('email', '').strip()
-            
-            if not token and not email:
-                cursor.close()
-                conn.close()
-                return {
-                    'statusCode': 400,
-                    'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                    'isBase64Encoded': False,
-                    'body': json.dumps({'error': 'Token or email is required'})
-                }
+            token = body_data.get('token')
+            email = body_data.get('email')
             
             if token:
                 cursor.execute(
                     """UPDATE t_p68014762_remove_login_system.users 
                        SET subscribed_to_updates = FALSE 
-                       WHERE unsubscribe_token = %s""",
-                    (token,)
+                       WHERE unsubscribe_token_hash = %s""",
+                    (hash_unsubscribe_token(token),)
                 )
             else:
                 cursor.execute(
@@ -131,7 +1224,7 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             
             if cursor.rowcount == 0:
                 cursor.close()
-                conn.close()
+                release_connection(conn)
                 return {
                     'statusCode': 404,
                     'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
@@ -139,12 +1232,13 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                     'body': json.dumps({'error': 'Subscription not found'})
                 }
             
+            lsn_headers = write_lsn_headers(cursor)
             cursor.close()
-            conn.close()
+            release_connection(conn)
             
             return {
                 'statusCode': 200,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*', **lsn_headers},
                 'isBase64Encoded': False,
                 'body': json.dumps({
                     'message': 'Successfully unsubscribed from updates',
@@ -153,30 +1247,22 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             }
         
         elif action == 'status':
-            email = body_data.get('email', '').strip()
+            email = body_data['email']
             
-            if not email:
-                cursor.close()
-                conn.close()
-                return {
-                    'statusCode': 400,
-                    'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                    'isBase64Encoded': False,
-                    'body': json.dumps({'error': 'Email is required'})
-                }
+            user = fetch_one_shared(cursor, 'subscription_status', (email,))
             
-            cursor.execute(
-                """SELECT subscribed_to_updates, unsubscribe_token 
-                   FROM t_p68014762_remove_login_system.users 
-                   WHERE email = %s""",
-                (email,)
-            )
-            user = cursor.fetchone()
+            if not user and on_replica:
+                cursor.close()
+                release_connection(conn)
+                conn = get_connection(database_url)
+                cursor = conn.cursor()
+                user = fetch_one_shared(cursor, 'subscription_status', (email,))
             
             cursor.close()
-            conn.close()
+            release_connection(conn)
             
             if not user:
+                remember_missing_email(email)
                 return {
                     'statusCode': 404,
                     'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
@@ -190,12 +1276,119 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                 'isBase64Encoded': False,
                 'body': json.dumps({
                     'subscribed': user['subscribed_to_updates'] or False,
-                    'unsubscribe_token': user['unsubscribe_token']
+                    'unsubscribe_token': unsubscribe_token(user['id'])
+                })
+            }
+        
+        elif action in BATCH_ACTIONS:
+            emails = body_data.get('emails') or []
+            tokens = body_data.get('tokens') or []
+            
+            results: List[Dict[str, Any]] = []
+            
+            if action == 'status_batch':
+                cursor.execute(
+                    """SELECT id, email, subscribed_to_updates 
+                       FROM t_p68014762_remove_login_system.users 
+                       WHERE email = ANY(%s)""",
+                    (emails,)
+                )
+                found = {row['email']: row for row in cursor.fetchall()}
+                for email in emails:
+                    user = found.get(email)
+                    if user:
+                        results.append({
+                            'email': email,
+                            'subscribed': user['subscribed_to_updates'] or False,
+                            'unsubscribe_token': unsubscribe_token(user['id'])
+                        })
+                    else:
+                        results.append({'email': email, 'error': 'User not found'})
+            
+            elif action == 'subscribe_batch':
+                from psycopg2.extras import execute_values
+                cursor.execute(
+                    """SELECT id, email, subscribed_to_updates 
+                       FROM t_p68014762_remove_login_system.users 
+                       WHERE email = ANY(%s)""",
+                    (emails,)
+                )
+                found = {row['email']: row for row in cursor.fetchall()}
+                # an explicit opt-out (FALSE) is the user's decision; a bulk subscribe never overrides it
+                issued = {
+                    user['id']: unsubscribe_token(user['id'])
+                    for user in found.values() if user['subscribed_to_updates'] is not False
+                }
+                if issued:
+                    execute_values(
+                        cursor,
+                        """UPDATE t_p68014762_remove_login_system.users AS u 
+                           SET subscribed_to_updates = TRUE, unsubscribe_token_hash = v.token_hash 
+                           FROM (VALUES %s) AS v(id, token_hash) 
+                           WHERE u.id = v.id AND u.subscribed_to_updates IS NOT FALSE""",
+                        [(user_id, hash_unsubscribe_token(token)) for user_id, token in issued.items()],
+                        template='(%s::integer, %s)',
+                        page_size=len(issued)
+                    )
+                    conn.commit()
+                for email in emails:
+                    user = found.get(email)
+                    if not user:
+                        results.append({'email': email, 'error': 'User not found'})
+                    elif user['id'] in issued:
+                        results.append({'email': email, 'subscribed': True, 'unsubscribe_token': issued[user['id']]})
+                    else:
+                        results.append({'email': email, 'subscribed': False, 'error': 'User has unsubscribed'})
+            
+            else:
+                unsubscribed_tokens = set()
+                unsubscribed_emails = set()
+                if tokens:
+                    cursor.execute(
+                        """UPDATE t_p68014762_remove_login_system.users 
+                           SET subscribed_to_updates = FALSE 
+                           WHERE unsubscribe_token_hash = ANY(%s) 
+                           RETURNING unsubscribe_token_hash""",
+                        ([hash_unsubscribe_token(token) for token in tokens],)
+                    )
+                    unsubscribed_tokens = {row['unsubscribe_token_hash'] for row in cursor.fetchall()}
+                if emails:
+                    cursor.execute(
+                        """UPDATE t_p68014762_remove_login_system.users 
+                           SET subscribed_to_updates = FALSE 
+                           WHERE email = ANY(%s) 
+                           RETURNING email""",
+                        (emails,)
+                    )
+                    unsubscribed_emails = {row['email'] for row in cursor.fetchall()}
+                conn.commit()
+                for token in tokens:
+                    if hash_unsubscribe_token(token) in unsubscribed_tokens:
+                        results.append({'token': token, 'subscribed': False})
+                    else:
+                        results.append({'token': token, 'error': 'Subscription not found'})
+                for email in emails:
+                    if email in unsubscribed_emails:
+                        results.append({'email': email, 'subscribed': False})
+                    else:
+                        results.append({'email': email, 'error': 'Subscription not found'})
+            
+            cursor.close()
+            release_connection(conn)
+            
+            return {
+                'statusCode': 200,
+                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+                'isBase64Encoded': False,
+                'body': json.dumps({
+                    'results': results,
+                    'processed': len(results),
+                    'failed': sum(1 for r in results if 'error' in r)
                 })
             }
     
     cursor.close()
-    conn.close()
+    release_connection(conn)
     
     return {
         'statusCode': 405,
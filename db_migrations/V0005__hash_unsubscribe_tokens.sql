@@ -0,0 +1,12 @@
+-- Store unsubscribe tokens as sha256 hex digests behind a unique index
+ALTER TABLE t_p68014762_remove_login_system.users 
+ADD COLUMN IF NOT EXISTS unsubscribe_token_hash varchar(64) DEFAULT NULL;
+
+-- migrate:batch key=id size=5000
+UPDATE t_p68014762_remove_login_system.users 
+SET unsubscribe_token_hash = encode(sha256(convert_to(unsubscribe_token, 'UTF8')), 'hex'),
+    unsubscribe_token = NULL
+WHERE unsubscribe_token IS NOT NULL;
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_users_unsubscribe_token_hash 
+ON t_p68014762_remove_login_system.users (unsubscribe_token_hash);
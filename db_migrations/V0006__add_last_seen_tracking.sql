@@ -0,0 +1,10 @@
+-- Track last login and last activity for users and sessions (written behind by auth/donations)
+ALTER TABLE t_p68014762_remove_login_system.users 
+ADD COLUMN IF NOT EXISTS last_login_at timestamp without time zone DEFAULT NULL,
+ADD COLUMN IF NOT EXISTS last_seen_at timestamp without time zone DEFAULT NULL;
+
+ALTER TABLE t_p68014762_remove_login_system.sessions 
+ADD COLUMN IF NOT EXISTS last_seen_at timestamp without time zone DEFAULT NULL;
+
+CREATE INDEX IF NOT EXISTS idx_users_last_seen_at 
+ON t_p68014762_remove_login_system.users (last_seen_at);
@@ -0,0 +1,4 @@
+-- Partial index for the unverified-registration reaper (scripts/reap_unverified.py) and stale-row reclaim in register
+CREATE INDEX IF NOT EXISTS idx_users_unverified_code_expires 
+ON t_p68014762_remove_login_system.users (verification_code_expires) 
+WHERE email_verified = FALSE AND verification_code IS NOT NULL;
@@ -0,0 +1,10 @@
+-- Unsubscribe tokens are now HMAC-SHA256 of 'unsubscribe:<id>' under UNSUBSCRIBE_SECRET (urlsafe base64,
+-- unpadded), so the hashes V0005 stored for the old random tokens never match. Recompute them for every
+-- row; scripts/migrate.py passes the secret as app.unsubscribe_secret and this fails if it is unset.
+CREATE EXTENSION IF NOT EXISTS pgcrypto;
+
+-- migrate:batch key=id size=5000
+UPDATE t_p68014762_remove_login_system.users 
+SET unsubscribe_token_hash = encode(sha256(convert_to(rtrim(translate(encode(
+        hmac('unsubscribe:' || id, current_setting('app.unsubscribe_secret'), 'sha256'),
+    'base64'), '+/', '-_'), '='), 'UTF8')), 'hex');
@@ -0,0 +1,103 @@
+"""
+Business: Benchmark response compression CPU cost against bytes saved on realistic handler payloads
+Args: --donations N sizes of donation history (repeatable), --batch N subscription batch size, --iterations N
+Returns: Per payload and codec/level: wire bytes, ratio, compress time and bytes saved per CPU millisecond
+"""
+import argparse
+import gzip
+import json
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from handler_loader import load_handler
+
+
+def donation_history(count: int, rng: random.Random) -> str:
+    started = datetime(2024, 1, 1)
+    donations = [
+        {
+            'id': 100000 + i,
+            'amount': round(rng.lognormvariate(6, 1.2), 2),
+            'status': rng.choice(['completed'] * 17 + ['pending', 'pending', 'failed']),
+            'created_at': (started + timedelta(minutes=rng.randrange(1000000))).isoformat()
+        }
+        for i in range(count)
+    ]
+    total = sum(d['amount'] for d in donations if d['status'] == 'completed')
+    return json.dumps({'donations': donations, 'total': total, 'has_donated': total > 0})
+
+
+def subscription_batch(count: int, rng: random.Random) -> str:
+    results = [
+        {
+            'email': f'user{i}@example.org',
+            'subscribed': True,
+            'token': ''.join(rng.choice('abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789-_') for _ in range(64))
+        }
+        for i in range(count)
+    ]
+    return json.dumps({'results': results, 'processed': count, 'failed': 0})
+
+
+def codecs() -> List[Tuple[str, Callable[[bytes], bytes]]]:
+    entries = [(f'gzip-{level}', lambda data, level=level: gzip.compress(data, compresslevel=level, mtime=0))
+               for level in (1, 6, 9)]
+    try:
+        import brotli
+    except ImportError:
+        print('brotli is not installed; only gzip is measured', file=sys.stderr)
+        return entries
+    entries += [(f'br-{quality}', lambda data, quality=quality: brotli.compress(data, quality=quality))
+                for quality in (1, 5, 11)]
+    return entries
+
+
+def measure(fn: Callable[[bytes], bytes], data: bytes, iterations: int) -> Tuple[int, float]:
+    compressed = fn(data)
+    started = time.perf_counter()
+    for _ in range(iterations):
+        fn(data)
+    return len(compressed), (time.perf_counter() - started) / iterations
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Compression CPU cost vs bytes saved')
+    parser.add_argument('--donations', type=int, action='append', help='donation history sizes (default 10, 200, 5000)')
+    parser.add_argument('--batch', type=int, default=10000, help='subscribe_batch result size')
+    parser.add_argument('--iterations', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    payloads: Dict[str, str] = {f'donations x{n}': donation_history(n, rng) for n in (args.donations or [10, 200, 5000])}
+    payloads[f'subscribe_batch x{args.batch}'] = subscription_batch(args.batch, rng)
+
+    measured = codecs()
+    module = load_handler('donations')
+    print(f'threshold COMPRESSION_MIN_BYTES={module.COMPRESSION_MIN_BYTES}, '
+          f'handler defaults gzip-{module.GZIP_LEVEL} / br-{module.BROTLI_QUALITY}')
+    print(f'{"payload":<24} {"codec":<8} {"raw B":>10} {"wire B":>10} {"ratio":>6} {"cpu us":>10} {"saved KB/cpu ms":>16}')
+    for label, body in payloads.items():
+        data = body.encode('utf-8')
+        for codec, fn in measured:
+            size, seconds = measure(fn, data, args.iterations)
+            saved_per_ms = (len(data) - size) / 1024 / (seconds * 1000) if seconds else 0.0
+            print(f'{label:<24} {codec:<8} {len(data):>10} {size:>10} {size / len(data):>6.2f} '
+                  f'{seconds * 1e6:>10.1f} {saved_per_ms:>16.1f}')
+
+        event: Dict[str, Any] = {'headers': {'Accept-Encoding': 'gzip, br'}}
+        response = {'statusCode': 200, 'headers': {}, 'isBase64Encoded': False, 'body': body}
+        module._invocation.events = {}
+        started = time.perf_counter()
+        for _ in range(args.iterations):
+            module.compress_response(event, response)
+        layer = (time.perf_counter() - started) / args.iterations
+        print(f'{label:<24} {"layer":<8} compress_response incl. base64: {layer * 1e6:.1f} us')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
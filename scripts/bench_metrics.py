@@ -0,0 +1,60 @@
+"""
+Business: Measure the cost of the handlers' metrics: count_event per recorded event, observe_request per request, /metrics rendering
+Args: --iterations N calls per sample, --repeat R samples (best is reported), --handler name, --budget-us per-event budget
+Returns: Microseconds per call with and without the empty-call overhead; exit 1 if count_event exceeds the budget
+"""
+import argparse
+import os
+import sys
+import timeit
+from typing import Any, List, Optional
+
+from handler_loader import HANDLER_NAMES, load_handler
+import serve
+
+
+def best_us(fn, iterations: int, repeat: int) -> float:
+    return min(timeit.repeat(fn, number=iterations, repeat=repeat)) / iterations * 1e6
+
+
+def empty(*key: str) -> None:
+    pass
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Metrics recording cost')
+    parser.add_argument('--iterations', type=int, default=200000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--handler', default='auth', choices=HANDLER_NAMES)
+    parser.add_argument('--budget-us', type=float, default=1.0, help='allowed cost of one count_event call')
+    args = parser.parse_args(argv)
+
+    # no request is served; the handlers only need it to import
+    os.environ.setdefault('UNSUBSCRIBE_SECRET', 'bench')
+    module: Any = load_handler(args.handler)
+    module.METRICS_LOG = False
+    call = best_us(lambda: empty('cache', 'prepared', 'hit'), args.iterations, args.repeat)
+
+    module._invocation.events = {}
+    in_invocation = best_us(lambda: module.count_event('cache', 'prepared', 'hit'), args.iterations, args.repeat)
+    module._invocation.events = None
+    outside = best_us(lambda: module.count_event('db_connections', 'opened'), args.iterations, args.repeat)
+
+    events = {('cache', 'prepared', 'hit'): 3, ('db_connections', 'reused'): 1, ('single_flight', 'session_user', 'leader'): 1}
+    observe = best_us(lambda: module.observe_request('login', events, 200, 12.5), args.iterations // 10, args.repeat)
+    snapshots = [load_handler(name).metrics_snapshot() for name in HANDLER_NAMES]
+    render = best_us(lambda: serve.render_metrics(snapshots), max(1, args.iterations // 1000), args.repeat)
+
+    print(f'{"sample":<42} {"us/call":>9} {"net us":>9}')
+    print(f'{"empty call (3 labels)":<42} {call:>9.3f} {"":>9}')
+    print(f'{"count_event inside an invocation":<42} {in_invocation:>9.3f} {in_invocation - call:>9.3f}')
+    print(f'{"count_event outside (locked counters)":<42} {outside:>9.3f} {outside - call:>9.3f}')
+    print(f'{"observe_request, 3 event kinds":<42} {observe:>9.3f}')
+    print(f'{"render_metrics, all handlers":<42} {render:>9.3f}')
+    within = in_invocation <= args.budget_us
+    print(f'count_event {in_invocation:.3f} us per event: {"within" if within else "over"} the {args.budget_us:g} us budget')
+    return 0 if within else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
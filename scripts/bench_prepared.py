@@ -0,0 +1,86 @@
+"""
+Business: Compare plain vs prepared execution of the handlers' registered hot queries
+Args: --iterations N per query and mode, --handler name (repeatable), --email/--token/--user-id sample parameters
+Returns: Per-query mean latency, QPS and planning time (EXPLAIN ANALYZE) on stdout
+"""
+import argparse
+import os
+import sys
+import time
+from typing import List, Optional, Tuple
+import psycopg2
+
+from handler_loader import HANDLER_NAMES, load_handler
+
+
+def sample_params(sql: str, args: argparse.Namespace) -> Tuple:
+    if 's.token = %s' in sql:
+        return (args.token,)
+    if 'user_id = %s' in sql:
+        return (args.user_id,)
+    if 'password_hash = %s' in sql:
+        return (args.email, 'x' * 64)
+    return (args.email,)
+
+
+def time_loop(cursor, sql: str, params: Tuple, iterations: int) -> float:
+    started = time.perf_counter()
+    for _ in range(iterations):
+        cursor.execute(sql, params)
+        cursor.fetchall()
+    return (time.perf_counter() - started) / iterations
+
+
+def planning_ms(cursor, sql: str, params: Tuple) -> float:
+    cursor.execute(f'EXPLAIN (ANALYZE, SUMMARY) {sql}', params)
+    for (line,) in cursor.fetchall():
+        if line.startswith('Planning Time:'):
+            return float(line.split(':')[1].split()[0])
+    return 0.0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Plain vs prepared execution of registered queries')
+    parser.add_argument('--handler', action='append', choices=HANDLER_NAMES)
+    parser.add_argument('--iterations', type=int, default=2000)
+    parser.add_argument('--email', default='bench@example.invalid')
+    parser.add_argument('--token', default='bench-token')
+    parser.add_argument('--user-id', type=int, default=1)
+    args = parser.parse_args(argv)
+
+    database_url = os.environ.get('DATABASE_URL')
+    if not database_url:
+        print('DATABASE_URL is required', file=sys.stderr)
+        return 2
+
+    conn = psycopg2.connect(database_url)
+    conn.autocommit = True
+    cursor = conn.cursor()
+    print(f'{"query":<38} {"plain us":>10} {"prepared us":>12} {"saved":>7} {"plain qps":>10} {"prep qps":>10} {"plan ms":>8}')
+    for handler_name in args.handler or HANDLER_NAMES:
+        module = load_handler(handler_name)
+        for name, sql in module.QUERIES.items():
+            if not sql.lstrip().upper().startswith('SELECT'):
+                continue
+            params = sample_params(sql, args)
+            # the handler's own PREPARE/EXECUTE text; deallocated again because names repeat across handlers
+            prepare_sql, execute_sql = module._PREPARED_QUERIES[name]
+            cursor.execute(prepare_sql)
+
+            plain = time_loop(cursor, sql, params, args.iterations)
+            prepared = time_loop(cursor, execute_sql, params, args.iterations)
+            plan = planning_ms(cursor, sql, params)
+            cursor.execute(f'DEALLOCATE {module.prepared_name(name)}')
+
+            saved = (plain - prepared) / plain * 100 if plain else 0.0
+            print(
+                f'{handler_name + "." + name:<38} {plain * 1e6:>10.1f} {prepared * 1e6:>12.1f} {saved:>6.1f}% '
+                f'{1 / plain:>10,.0f} {1 / prepared:>10,.0f} {plan:>8.3f}'
+            )
+    cursor.close()
+    conn.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,98 @@
+"""
+Business: Benchmark batch subscription actions against one-email-per-request calls
+Args: --items N emails per batch call (default 10000), --single-sample N single calls to time
+Returns: Timing report on stdout; seeded benchmark users are removed afterwards
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from typing import Any, Dict, List, Optional
+import psycopg2
+from psycopg2.extras import execute_values
+
+from handler_loader import load_handler
+
+SCHEMA = 't_p68014762_remove_login_system'
+EMAIL_PREFIX = 'bench-batch-'
+
+
+def seed_users(conn, count: int) -> List[str]:
+    emails = [f'{EMAIL_PREFIX}{i}@example.invalid' for i in range(count)]
+    cursor = conn.cursor()
+    execute_values(
+        cursor,
+        f"""INSERT INTO {SCHEMA}.users (email, password_hash, email_verified, subscribed_to_updates)
+            VALUES %s ON CONFLICT (email) DO NOTHING""",
+        # NULL (never chosen) rather than FALSE: subscribe_batch leaves explicit opt-outs alone
+        [(email, 'x' * 64, True, None) for email in emails],
+        page_size=5000
+    )
+    conn.commit()
+    cursor.close()
+    return emails
+
+
+def cleanup(conn) -> None:
+    cursor = conn.cursor()
+    cursor.execute(f'DELETE FROM {SCHEMA}.users WHERE email LIKE %s', (f'{EMAIL_PREFIX}%',))
+    conn.commit()
+    cursor.close()
+
+
+def call(module: Any, body: Dict[str, Any]) -> Dict[str, Any]:
+    event = {
+        'httpMethod': 'POST',
+        'headers': {'X-Admin-Key': os.environ['ADMIN_API_KEY']},
+        'body': json.dumps(body)
+    }
+    response = module.handler(event, None)
+    if response['statusCode'] != 200:
+        raise RuntimeError(f"{body['action']} failed: {response['body']}")
+    return json.loads(response['body'])
+
+
+def timed(label: str, items: int, fn) -> float:
+    started = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - started
+    print(f'{label:<28} {items:>7} items  {elapsed * 1000:10.1f} ms  {items / elapsed:12,.0f} items/sec')
+    return elapsed
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Benchmark batch vs single subscription actions')
+    parser.add_argument('--items', type=int, default=10000)
+    parser.add_argument('--single-sample', type=int, default=200)
+    args = parser.parse_args(argv)
+
+    database_url = os.environ.get('DATABASE_URL')
+    if not database_url:
+        print('DATABASE_URL is required', file=sys.stderr)
+        return 2
+    os.environ.setdefault('ADMIN_API_KEY', 'bench-admin-key')
+
+    module = load_handler('subscriptions')
+    conn = psycopg2.connect(database_url)
+    try:
+        emails = seed_users(conn, args.items)
+        sample = emails[:args.single_sample]
+
+        single = timed('single status (sample)', len(sample), lambda: [
+            module.handler({'httpMethod': 'POST', 'body': json.dumps({'action': 'status', 'email': e})}, None)
+            for e in sample
+        ])
+        print(f'{"  extrapolated to --items":<28} {args.items:>7} items  {single / len(sample) * args.items * 1000:10.1f} ms')
+
+        timed('status_batch', len(emails), lambda: call(module, {'action': 'status_batch', 'emails': emails}))
+        timed('subscribe_batch', len(emails), lambda: call(module, {'action': 'subscribe_batch', 'emails': emails}))
+        timed('unsubscribe_batch (emails)', len(emails), lambda: call(module, {'action': 'unsubscribe_batch', 'emails': emails}))
+    finally:
+        cleanup(conn)
+        conn.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,66 @@
+"""
+Business: Measure per-request cost of the handlers' body decoding and schema validation
+Args: --iterations N per sample, --batch N emails in the batch sample
+Returns: Per handler/sample: outcome, microseconds per request and the plain json.loads baseline
+"""
+import argparse
+import json
+import sys
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from handler_loader import load_handler
+
+SAMPLES: List[Tuple[str, str, Dict[str, Any]]] = [
+    ('auth', 'register ok', {'action': 'register', 'email': 'user@example.org', 'password': 'correct horse'}),
+    ('auth', 'register short password', {'action': 'register', 'email': 'user@example.org', 'password': '123'}),
+    ('auth', 'login missing field', {'action': 'login', 'email': 'user@example.org'}),
+    ('auth', 'unknown action', {'action': 'drop_tables'}),
+    ('account', 'reset_password ok', {'action': 'reset_password', 'email': 'user@example.org', 'code': '123456', 'password': 'new secret'}),
+    ('donations', 'create ok', {'amount': 500}),
+    ('donations', 'create negative', {'amount': -50}),
+    ('subscriptions', 'status ok', {'action': 'status', 'email': 'user@example.org'}),
+    ('subscriptions', 'unsubscribe by token', {'action': 'unsubscribe', 'token': 'x' * 64}),
+]
+
+
+def decode_and_validate(module: Any, body: str, default_action: Optional[str]) -> Optional[Dict[str, Any]]:
+    data, rejection = module.decode_body({'body': body})
+    return rejection or module.validate_body(data.get('action', default_action), data)
+
+
+def per_request(fn, iterations: int) -> float:
+    started = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - started) / iterations
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Body decoding and validation cost per request')
+    parser.add_argument('--iterations', type=int, default=20000)
+    parser.add_argument('--batch', type=int, default=10000)
+    args = parser.parse_args(argv)
+
+    samples = list(SAMPLES)
+    samples.append(('subscriptions', f'status_batch x{args.batch}',
+                    {'action': 'status_batch', 'emails': [f'user{i}@example.org' for i in range(args.batch)]}))
+    samples.append(('auth', 'oversized body', {'action': 'login', 'email': 'x' * 100000, 'password': 'secret'}))
+
+    print(f'{"handler":<14} {"sample":<28} {"outcome":>8} {"validate us":>12} {"json.loads us":>14}')
+    for handler_name, label, payload in samples:
+        module = load_handler(handler_name)
+        module._invocation.events = {}
+        default_action = 'create' if handler_name == 'donations' else None
+        body = json.dumps(payload)
+        iterations = max(1, args.iterations // max(1, len(body) // 1000))
+        rejection = decode_and_validate(module, body, default_action)
+        outcome = str(rejection['statusCode']) if rejection else 'valid'
+        validate = per_request(lambda: decode_and_validate(module, body, default_action), iterations)
+        baseline = per_request(lambda: json.loads(body), iterations)
+        print(f'{handler_name:<14} {label:<28} {outcome:>8} {validate * 1e6:>12.2f} {baseline * 1e6:>14.2f}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,268 @@
+"""
+Business: Bulk import/export of users, donations and sessions through COPY
+Args: import|export, --table users|donations|sessions, --format csv|jsonl, --file path ('-' for stdin/stdout)
+Returns: Exit code 0 on success; throughput report (rows/sec) on stderr
+"""
+import argparse
+import csv
+import io
+import json
+import os
+import sys
+import time
+from typing import Dict, Any, List, Optional, Tuple, IO
+import psycopg2
+
+from handler_loader import unsubscribe_token_hash
+
+SCHEMA = 't_p68014762_remove_login_system'
+
+TABLES: Dict[str, Dict[str, Any]] = {
+    'users': {
+        'stage_columns': {
+            'email': 'varchar(255)',
+            'password_hash': 'varchar(255)',
+            'created_at': 'timestamp',
+            'updated_at': 'timestamp',
+            'email_verified': 'boolean',
+            'subscribed_to_updates': 'boolean',
+            # accepted from older files but ignored: tokens are derived from the new row's id
+            'unsubscribe_token': 'varchar(64)',
+        },
+        'required': ['email', 'password_hash'],
+        'export_columns': ['id', 'email', 'password_hash', 'created_at', 'updated_at',
+                           'email_verified', 'subscribed_to_updates'],
+        'merge': f"""
+            INSERT INTO {SCHEMA}.users
+                (email, password_hash, created_at, updated_at, email_verified, subscribed_to_updates)
+            SELECT DISTINCT ON (s.email)
+                s.email, s.password_hash,
+                COALESCE(s.created_at, CURRENT_TIMESTAMP), COALESCE(s.updated_at, CURRENT_TIMESTAMP),
+                COALESCE(s.email_verified, FALSE), COALESCE(s.subscribed_to_updates, TRUE)
+            FROM _stage s
+            WHERE s.email IS NOT NULL AND s.email <> '' AND s.password_hash IS NOT NULL
+            ORDER BY s.email
+            ON CONFLICT (email) DO NOTHING
+            RETURNING id
+        """,
+    },
+    'donations': {
+        'stage_columns': {
+            'user_id': 'integer',
+            'user_email': 'varchar(255)',
+            'amount': 'numeric(10, 2)',
+            'status': 'varchar(50)',
+            'created_at': 'timestamp',
+        },
+        'required': ['amount'],
+        'export_columns': ['id', 'user_id', 'amount', 'status', 'created_at'],
+        'merge': f"""
+            INSERT INTO {SCHEMA}.donations (user_id, amount, status, created_at)
+            SELECT u.id, s.amount, COALESCE(s.status, 'completed'), COALESCE(s.created_at, CURRENT_TIMESTAMP)
+            FROM _stage s
+            JOIN {SCHEMA}.users u ON u.id = s.user_id
+            WHERE s.amount > 0
+        """,
+    },
+    'sessions': {
+        'stage_columns': {
+            'user_id': 'integer',
+            'user_email': 'varchar(255)',
+            'token': 'varchar(255)',
+            'expires_at': 'timestamp',
+            'created_at': 'timestamp',
+        },
+        'required': ['token', 'expires_at'],
+        'export_columns': ['id', 'user_id', 'token', 'expires_at', 'created_at'],
+        'merge': f"""
+            INSERT INTO {SCHEMA}.sessions (user_id, token, expires_at, created_at)
+            SELECT DISTINCT ON (s.token) u.id, s.token, s.expires_at, COALESCE(s.created_at, CURRENT_TIMESTAMP)
+            FROM _stage s
+            JOIN {SCHEMA}.users u ON u.id = s.user_id
+            WHERE s.token IS NOT NULL AND s.expires_at IS NOT NULL
+            ORDER BY s.token
+            ON CONFLICT (token) DO NOTHING
+        """,
+    },
+}
+
+RESOLVE_USER_EMAIL = f"""
+    UPDATE _stage s SET user_id = u.id
+    FROM {SCHEMA}.users u
+    WHERE s.user_id IS NULL AND s.user_email IS NOT NULL AND u.email = s.user_email
+"""
+
+
+class JsonlCopyReader:
+    """File-like adapter that turns JSONL records into CSV for COPY FROM STDIN, one line at a time."""
+
+    def __init__(self, source: IO[str], columns: List[str]):
+        self.source = source
+        self.columns = columns
+        self.buffer = io.StringIO()
+        self.writer = csv.writer(self.buffer, lineterminator='\n')
+        self.pending = ''
+
+    def read(self, size: int = -1) -> str:
+        while size < 0 or len(self.pending) < size:
+            line = self.source.readline()
+            if not line:
+                break
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            self.writer.writerow(['' if record.get(c) is None else record[c] for c in self.columns])
+            self.pending += self.buffer.getvalue()
+            self.buffer.seek(0)
+            self.buffer.truncate()
+        if size < 0:
+            chunk, self.pending = self.pending, ''
+        else:
+            chunk, self.pending = self.pending[:size], self.pending[size:]
+        return chunk
+
+
+class _Prepended:
+    def __init__(self, head: str, rest: IO[str]):
+        self.head = head
+        self.rest = rest
+
+    def readline(self) -> str:
+        if self.head:
+            line, self.head = self.head, ''
+            return line
+        return self.rest.readline()
+
+
+def report(label: str, rows: int, seconds: float) -> None:
+    rate = rows / seconds if seconds > 0 else float('inf')
+    print(f'{label}: {rows} rows in {seconds:.2f}s ({rate:,.0f} rows/sec)', file=sys.stderr)
+
+
+def peek_columns(source: IO[str], fmt: str) -> Tuple[List[str], Any]:
+    first = source.readline()
+    while fmt == 'jsonl' and first and not first.strip():
+        first = source.readline()
+    if not first:
+        return [], source
+    if fmt == 'csv':
+        columns = next(csv.reader([first]))
+        return [c.strip() for c in columns], source
+    columns = list(json.loads(first).keys())
+    return columns, _Prepended(first, source)
+
+
+def set_unsubscribe_token_hashes(cursor, user_ids: List[int]) -> None:
+    # the token is derived from the id the merge just assigned, so the hashes are written in a second pass
+    hashes = io.StringIO(''.join(f'{user_id},{unsubscribe_token_hash(user_id)}\n' for user_id in user_ids))
+    cursor.execute('CREATE TEMP TABLE _token_hashes (id integer, token_hash varchar(64)) ON COMMIT DROP')
+    cursor.copy_expert('COPY _token_hashes (id, token_hash) FROM STDIN WITH (FORMAT csv)', hashes)
+    cursor.execute(
+        f'UPDATE {SCHEMA}.users u SET unsubscribe_token_hash = t.token_hash FROM _token_hashes t WHERE u.id = t.id'
+    )
+
+
+def import_table(conn, table: str, fmt: str, source: IO[str]) -> Dict[str, int]:
+    spec = TABLES[table]
+    columns, source = peek_columns(source, fmt)
+    unknown = [c for c in columns if c not in spec['stage_columns']]
+    if unknown:
+        raise ValueError(f'Unknown columns for {table}: {", ".join(unknown)}')
+    missing = [c for c in spec['required'] if c not in columns]
+    if missing:
+        raise ValueError(f'Missing required columns for {table}: {", ".join(missing)}')
+    if table != 'users' and 'user_id' not in columns and 'user_email' not in columns:
+        raise ValueError(f'{table} rows need user_id or user_email')
+
+    column_defs = ', '.join(f'{name} {sql_type}' for name, sql_type in spec['stage_columns'].items())
+    column_list = ', '.join(columns)
+    cursor = conn.cursor()
+    cursor.execute(f'CREATE TEMP TABLE _stage ({column_defs}) ON COMMIT DROP')
+
+    started = time.perf_counter()
+    if fmt == 'csv':
+        cursor.copy_expert(f'COPY _stage ({column_list}) FROM STDIN WITH (FORMAT csv)', source)
+    else:
+        reader = JsonlCopyReader(source, columns)
+        cursor.copy_expert(f'COPY _stage ({column_list}) FROM STDIN WITH (FORMAT csv)', reader)
+    staged = cursor.rowcount
+    report(f'copy {table}', staged, time.perf_counter() - started)
+
+    started = time.perf_counter()
+    cursor.execute('ANALYZE _stage')
+    if 'user_email' in columns:
+        cursor.execute(RESOLVE_USER_EMAIL)
+    cursor.execute(spec['merge'])
+    merged = cursor.rowcount
+    if table == 'users':
+        set_unsubscribe_token_hashes(cursor, [row[0] for row in cursor.fetchall()])
+    conn.commit()
+    report(f'merge {table}', merged, time.perf_counter() - started)
+    cursor.close()
+
+    return {'staged': staged, 'merged': merged, 'skipped': staged - merged}
+
+
+def export_table(conn, table: str, fmt: str, target: IO[str]) -> int:
+    spec = TABLES[table]
+    column_list = ', '.join(spec['export_columns'])
+    query = f'SELECT {column_list} FROM {SCHEMA}.{table} ORDER BY id'
+    if fmt == 'csv':
+        copy_sql = f'COPY ({query}) TO STDOUT WITH (FORMAT csv, HEADER true)'
+    else:
+        copy_sql = (
+            f'COPY (SELECT row_to_json(t)::text FROM ({query}) t) '
+            f"TO STDOUT WITH (FORMAT csv, QUOTE e'\\x01', DELIMITER e'\\x02')"
+        )
+
+    started = time.perf_counter()
+    cursor = conn.cursor()
+    cursor.copy_expert(copy_sql, target)
+    exported = cursor.rowcount
+    cursor.close()
+    conn.rollback()
+    report(f'export {table}', exported, time.perf_counter() - started)
+    return exported
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Bulk COPY import/export for users, donations and sessions')
+    parser.add_argument('command', choices=['import', 'export'])
+    parser.add_argument('--table', required=True, choices=sorted(TABLES))
+    parser.add_argument('--format', default='csv', choices=['csv', 'jsonl'])
+    parser.add_argument('--file', default='-', help="input/output path, '-' for stdin/stdout")
+    parser.add_argument('--dsn', default=os.environ.get('DATABASE_URL'))
+    args = parser.parse_args(argv)
+
+    if not args.dsn:
+        print('DATABASE_URL is not set and --dsn was not given', file=sys.stderr)
+        return 2
+
+    conn = psycopg2.connect(args.dsn)
+    try:
+        if args.command == 'import':
+            source = sys.stdin if args.file == '-' else open(args.file, encoding='utf-8', newline='')
+            try:
+                result = import_table(conn, args.table, args.format, source)
+            finally:
+                if source is not sys.stdin:
+                    source.close()
+            print(json.dumps(result), file=sys.stderr)
+        else:
+            target = sys.stdout if args.file == '-' else open(args.file, 'w', encoding='utf-8', newline='')
+            try:
+                export_table(conn, args.table, args.format, target)
+            finally:
+                if target is not sys.stdout:
+                    target.close()
+    except ValueError as e:
+        conn.rollback()
+        print(f'Error: {e}', file=sys.stderr)
+        return 1
+    finally:
+        conn.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
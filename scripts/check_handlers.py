@@ -0,0 +1,93 @@
+"""
+Business: Check the handlers against a scratch Postgres with db_migrations applied (CI): queries prepare, ETags round-trip
+Args: --dsn (default DATABASE_URL; the role's search_path must include the app schema), --handler name (repeatable)
+Returns: One line per failed check and a summary; exit 1 if any check failed
+"""
+import argparse
+import os
+import secrets
+import sys
+from typing import Any, List, Optional
+
+import psycopg2
+
+from handler_loader import HANDLER_NAMES, load_handler
+
+
+def check_prepared(conn: Any, name: str, module: Any) -> List[str]:
+    failures = []
+    cursor = conn.cursor()
+    for query, (prepare_sql, _) in module._PREPARED_QUERIES.items():
+        try:
+            cursor.execute(prepare_sql)
+            cursor.execute(f'DEALLOCATE {module.prepared_name(query)}')
+        except psycopg2.Error as e:
+            failures.append(f'{name}.{query}: PREPARE failed: {str(e).strip()}')
+    cursor.close()
+    return failures
+
+
+def check_etag_round_trip(conn: Any, name: str, module: Any) -> List[str]:
+    # a scratch user and session; GET once, send the tag back and expect 304 without a body
+    token = secrets.token_urlsafe(32)
+    cursor = conn.cursor()
+    cursor.execute(
+        "INSERT INTO users (email, password_hash) VALUES (%s, 'x') RETURNING id",
+        (f'check-handlers-{token[:12]}@example.invalid',)
+    )
+    user_id = cursor.fetchone()[0]
+    cursor.execute(
+        "INSERT INTO sessions (user_id, token, expires_at) VALUES (%s, %s, NOW() + INTERVAL '1 hour')",
+        (user_id, token)
+    )
+    try:
+        event = {'httpMethod': 'GET', 'headers': {'X-Auth-Token': token}, 'body': ''}
+        first = module.handler(event, None)
+        etag = (first.get('headers') or {}).get('ETag')
+        if first['statusCode'] != 200 or not etag:
+            return [f'{name}: GET returned {first["statusCode"]} without an ETag']
+        event['headers']['If-None-Match'] = etag
+        second = module.handler(event, None)
+        if second['statusCode'] != 304 or second.get('body'):
+            return [f'{name}: GET with If-None-Match {etag} returned {second["statusCode"]}, expected an empty 304']
+        return []
+    finally:
+        cursor.execute('DELETE FROM sessions WHERE user_id = %s', (user_id,))
+        cursor.execute('DELETE FROM users WHERE id = %s', (user_id,))
+        cursor.close()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Check handler queries against a migrated database')
+    parser.add_argument('--dsn', default=os.environ.get('DATABASE_URL'))
+    parser.add_argument('--handler', action='append', choices=HANDLER_NAMES)
+    args = parser.parse_args(argv)
+
+    if not args.dsn:
+        print('DATABASE_URL is not set and --dsn was not given', file=sys.stderr)
+        return 2
+
+    os.environ['DATABASE_URL'] = args.dsn
+    failures: List[str] = []
+    checked = round_trips = 0
+    conn = psycopg2.connect(args.dsn)
+    conn.autocommit = True
+    try:
+        for name in args.handler or HANDLER_NAMES:
+            module = load_handler(name)
+            failures += check_prepared(conn, name, module)
+            checked += len(module.QUERIES)
+            if hasattr(module, 'etag_matches'):
+                failures += check_etag_round_trip(conn, name, module)
+                round_trips += 1
+    finally:
+        conn.close()
+
+    for failure in failures:
+        print(failure, file=sys.stderr)
+    print(f'{checked} queries prepared, {round_trips} ETag round trips, {len(failures)} failures')
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
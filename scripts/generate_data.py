@@ -0,0 +1,202 @@
+"""
+Business: Generate deterministic synthetic users, sessions and donations at production scale and load them via parallel COPY
+Args: --users N, --seed S, --workers W, --chunk-size N, --now ISO timestamp, mix ratios; --migrate to apply db_migrations first; --output DIR to write CSV files instead of loading
+Returns: Per-table row counts and rows/sec on stderr
+
+Each chunk of users is generated from its own Random(seed, chunk), so the same seed, --now and
+--start-id produce identical data regardless of --workers. Users get explicit ids; the id
+sequence is advanced after the load.
+"""
+import argparse
+import base64
+import csv
+import hashlib
+import io
+import multiprocessing
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Any, List, Optional, Tuple
+import psycopg2
+
+from handler_loader import unsubscribe_token_hash
+
+SCHEMA = 't_p68014762_remove_login_system'
+
+USER_COLUMNS = ['id', 'email', 'password_hash', 'created_at', 'updated_at', 'email_verified',
+                'verification_code', 'verification_code_expires', 'subscribed_to_updates', 'unsubscribe_token_hash']
+SESSION_COLUMNS = ['user_id', 'token', 'expires_at', 'created_at']
+DONATION_COLUMNS = ['user_id', 'amount', 'status', 'created_at']
+
+EMAIL_DOMAINS = [('gmail.com', 40), ('yandex.ru', 25), ('mail.ru', 20), ('outlook.com', 8), ('example.org', 7)]
+DONATION_STATUSES = [('completed', 85), ('pending', 10), ('failed', 5)]
+SESSION_LIFETIME = timedelta(days=30)
+VERIFICATION_LIFETIME = timedelta(minutes=10)
+MAX_DONATIONS_PER_USER = 500
+
+
+def weighted(rng: random.Random, choices: List[Tuple[str, int]]) -> str:
+    return rng.choices([value for value, _ in choices], weights=[weight for _, weight in choices])[0]
+
+
+def token_from(rng: random.Random) -> str:
+    return base64.urlsafe_b64encode(rng.getrandbits(256).to_bytes(32, 'big')).rstrip(b'=').decode()
+
+
+def generate_chunk(chunk: int, first_id: int, count: int, args: argparse.Namespace) -> Dict[str, io.StringIO]:
+    rng = random.Random(f'{args.seed}:{chunk}')
+    now = args.now
+    history = timedelta(days=args.history_days)
+    buffers = {table: io.StringIO() for table in ('users', 'sessions', 'donations')}
+    users = csv.writer(buffers['users'], lineterminator='\n')
+    sessions = csv.writer(buffers['sessions'], lineterminator='\n')
+    donations = csv.writer(buffers['donations'], lineterminator='\n')
+
+    for user_id in range(first_id, first_id + count):
+        # sqrt skews sign-ups toward the recent end of the history window, like a growing service
+        created_at = now - history * (1 - rng.random() ** 0.5)
+        verified = rng.random() < args.verified_ratio
+        if verified:
+            code, code_expires = '', ''
+        else:
+            code = f'{rng.randrange(1000000):06d}'
+            code_expires = created_at + VERIFICATION_LIFETIME
+        users.writerow([
+            user_id,
+            f'user{user_id}@{weighted(rng, EMAIL_DOMAINS)}',
+            hashlib.sha256(f'password{user_id}'.encode()).hexdigest(),
+            created_at, created_at, verified, code, code_expires,
+            rng.random() < args.subscribed_ratio,
+            unsubscribe_token_hash(user_id)
+        ])
+        if not verified:
+            continue
+
+        session_count = min(int(rng.expovariate(1 / args.sessions_per_user)) if args.sessions_per_user else 0, 50)
+        for _ in range(session_count):
+            # logins spread over two session lifetimes, so about half of them are already expired
+            login_at = max(created_at, now - 2 * SESSION_LIFETIME * rng.random())
+            sessions.writerow([user_id, token_from(rng), login_at + SESSION_LIFETIME, login_at])
+
+        if rng.random() >= args.donor_ratio:
+            continue
+        donation_count = min(int(rng.paretovariate(args.donation_skew)), MAX_DONATIONS_PER_USER)
+        for _ in range(donation_count):
+            amount = max(1.0, round(rng.lognormvariate(6, 1.2), 2))
+            donated_at = created_at + (now - created_at) * rng.random()
+            donations.writerow([user_id, f'{amount:.2f}', weighted(rng, DONATION_STATUSES), donated_at])
+
+    for buffer in buffers.values():
+        buffer.seek(0)
+    return buffers
+
+
+def load_chunk(task: Tuple[int, int, int, argparse.Namespace]) -> Dict[str, Any]:
+    chunk, first_id, count, args = task
+    started = time.perf_counter()
+    buffers = generate_chunk(chunk, first_id, count, args)
+    rows = {table: buffer.getvalue().count('\n') for table, buffer in buffers.items()}
+    generated = time.perf_counter() - started
+
+    if args.output:
+        for table, buffer in buffers.items():
+            with open(os.path.join(args.output, f'{table}_{chunk:05d}.csv'), 'w', encoding='utf-8', newline='') as target:
+                target.write(buffer.getvalue())
+    else:
+        conn = psycopg2.connect(args.dsn)
+        try:
+            cursor = conn.cursor()
+            for table, columns in (('users', USER_COLUMNS), ('sessions', SESSION_COLUMNS), ('donations', DONATION_COLUMNS)):
+                cursor.copy_expert(
+                    f"COPY {SCHEMA}.{table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)",
+                    buffers[table]
+                )
+            conn.commit()
+            cursor.close()
+        finally:
+            conn.close()
+    return {'chunk': chunk, 'rows': rows, 'generate_s': generated, 'total_s': time.perf_counter() - started}
+
+
+def next_user_id(dsn: str) -> int:
+    conn = psycopg2.connect(dsn)
+    try:
+        cursor = conn.cursor()
+        cursor.execute(f'SELECT COALESCE(MAX(id), 0) + 1 FROM {SCHEMA}.users')
+        return cursor.fetchone()[0]
+    finally:
+        conn.close()
+
+
+def finish_load(dsn: str) -> None:
+    conn = psycopg2.connect(dsn)
+    conn.autocommit = True
+    try:
+        cursor = conn.cursor()
+        cursor.execute(
+            f"SELECT setval(pg_get_serial_sequence('{SCHEMA}.users', 'id'), (SELECT MAX(id) FROM {SCHEMA}.users))"
+        )
+        for table in ('users', 'sessions', 'donations'):
+            cursor.execute(f'ANALYZE {SCHEMA}.{table}')
+    finally:
+        conn.close()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Deterministic synthetic data for scale testing')
+    parser.add_argument('--users', type=int, default=100000)
+    parser.add_argument('--seed', default='1')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--chunk-size', type=int, default=20000, help='users per COPY transaction')
+    parser.add_argument('--start-id', type=int, help='first user id (default: after the current maximum)')
+    parser.add_argument('--now', type=datetime.fromisoformat, default=datetime.now().replace(microsecond=0),
+                        help='reference time for created_at/expires_at (pin it for reproducible output)')
+    parser.add_argument('--history-days', type=int, default=3 * 365)
+    parser.add_argument('--verified-ratio', type=float, default=0.8)
+    parser.add_argument('--subscribed-ratio', type=float, default=0.7)
+    parser.add_argument('--sessions-per-user', type=float, default=1.5, help='mean sessions per verified user')
+    parser.add_argument('--donor-ratio', type=float, default=0.15)
+    parser.add_argument('--donation-skew', type=float, default=1.3, help='Pareto shape; lower is more skewed')
+    parser.add_argument('--migrate', action='store_true', help='apply db_migrations before loading')
+    parser.add_argument('--output', help='write per-chunk CSV files to this directory instead of loading')
+    parser.add_argument('--dsn', default=os.environ.get('DATABASE_URL'))
+    args = parser.parse_args(argv)
+
+    if not args.output and not args.dsn:
+        print('DATABASE_URL is not set and --dsn was not given', file=sys.stderr)
+        return 2
+    if args.output:
+        os.makedirs(args.output, exist_ok=True)
+    if args.migrate and args.dsn:
+        import migrate
+        if migrate.main(['up', '--dsn', args.dsn]) != 0:
+            return 1
+    if args.start_id is None:
+        args.start_id = 1 if args.output else next_user_id(args.dsn)
+
+    tasks = []
+    for chunk, offset in enumerate(range(0, args.users, args.chunk_size)):
+        tasks.append((chunk, args.start_id + offset, min(args.chunk_size, args.users - offset), args))
+
+    started = time.perf_counter()
+    totals = {'users': 0, 'sessions': 0, 'donations': 0}
+    with multiprocessing.Pool(max(1, min(args.workers, len(tasks)))) as pool:
+        for result in pool.imap_unordered(load_chunk, tasks):
+            for table, rows in result['rows'].items():
+                totals[table] += rows
+            print(f"chunk {result['chunk']}: {result['rows']} in {result['total_s']:.2f}s "
+                  f"(generate {result['generate_s']:.2f}s)", file=sys.stderr)
+    elapsed = time.perf_counter() - started
+
+    if not args.output:
+        finish_load(args.dsn)
+    for table, rows in totals.items():
+        rate = rows / elapsed if elapsed > 0 else float('inf')
+        print(f'{table}: {rows} rows in {elapsed:.2f}s ({rate:,.0f} rows/sec)', file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
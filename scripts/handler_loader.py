@@ -0,0 +1,32 @@
+"""
+Business: Load backend function handlers (backend/<name>/index.py) into one process for local tooling
+Args: handler directory name
+Returns: Imported index module; unsubscribe_token_hash(user_id) for scripts that write users rows
+"""
+import importlib.util
+import os
+import sys
+from typing import Any, Dict
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend')
+HANDLER_NAMES = ['account', 'auth', 'donations', 'subscriptions']
+
+_loaded: Dict[str, Any] = {}
+
+
+def load_handler(name: str) -> Any:
+    if name not in _loaded:
+        path = os.path.join(BACKEND_DIR, name, 'index.py')
+        spec = importlib.util.spec_from_file_location(f'{name}_index', path)
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[spec.name] = module
+        spec.loader.exec_module(module)
+        _loaded[name] = module
+    return _loaded[name]
+
+
+def unsubscribe_token_hash(user_id: int) -> str:
+    # the handlers' own derivation (generated 'unsubscribe' section), so rows written by scripts can be
+    # unsubscribed with the token the API hands out; needs UNSUBSCRIBE_SECRET like the handlers
+    subscriptions = load_handler('subscriptions')
+    return subscriptions.hash_unsubscribe_token(subscriptions.unsubscribe_token(user_id))
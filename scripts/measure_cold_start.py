@@ -0,0 +1,114 @@
+"""
+Business: Measure import time and first-request latency of each backend handler in a fresh interpreter
+Args: --handler name (repeatable, default all), --top N import entries, --warmup to call warmup() before the first request
+Returns: Per-handler report on stdout; import breakdown comes from python -X importtime
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+from typing import Dict, Any, List, Optional
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend')
+
+PROBE_EVENTS: Dict[str, Dict[str, Any]] = {
+    'auth': {'httpMethod': 'GET', 'headers': {'X-Auth-Token': 'cold-start-probe'}},
+    'account': {'httpMethod': 'POST', 'body': json.dumps({'action': 'verify_reset_code', 'email': 'probe@example.invalid', 'code': '000000'})},
+    'donations': {'httpMethod': 'GET', 'headers': {'X-Auth-Token': 'cold-start-probe'}},
+    'subscriptions': {'httpMethod': 'POST', 'body': json.dumps({'action': 'status', 'email': 'probe@example.invalid'})},
+}
+
+PROBE_SCRIPT = '''
+import importlib.util, json, sys, time
+t0 = time.perf_counter()
+spec = importlib.util.spec_from_file_location(sys.argv[1], sys.argv[2])
+module = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(module)
+t1 = time.perf_counter()
+result = {'import_ms': (t1 - t0) * 1000}
+if sys.argv[4] == '1':
+    module.warmup()
+    result['warmup_ms'] = (time.perf_counter() - t1) * 1000
+t2 = time.perf_counter()
+module.handler({'httpMethod': 'OPTIONS'}, None)
+result['options_ms'] = (time.perf_counter() - t2) * 1000
+if sys.argv[5] == '1':
+    t3 = time.perf_counter()
+    response = module.handler(json.loads(sys.argv[3]), None)
+    result['first_request_ms'] = (time.perf_counter() - t3) * 1000
+    result['first_request_status'] = response['statusCode']
+result['modules_loaded'] = len(sys.modules)
+print(json.dumps(result))
+'''
+
+
+def parse_importtime(stderr: str) -> List[Dict[str, Any]]:
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        entries.append({
+            'self_us': int(self_us),
+            'cumulative_us': int(cumulative_us),
+            'depth': (len(name) - len(name.lstrip())) // 2,
+            'name': name.strip()
+        })
+    return entries
+
+
+def measure(name: str, warm: bool, top: int) -> Dict[str, Any]:
+    path = os.path.join(BACKEND_DIR, name, 'index.py')
+    with_db = '1' if os.environ.get('DATABASE_URL') else '0'
+    completed = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', PROBE_SCRIPT,
+         f'{name}_index', path, json.dumps(PROBE_EVENTS[name]), '1' if warm else '0', with_db],
+        capture_output=True, text=True, cwd=os.path.dirname(path)
+    )
+    if completed.returncode != 0:
+        return {'handler': name, 'error': completed.stderr.strip().splitlines()[-1]}
+
+    result = json.loads(completed.stdout.strip().splitlines()[-1])
+    entries = parse_importtime(completed.stderr)
+    top_level = [e for e in entries if e['depth'] <= 1]
+    result['handler'] = name
+    result['import_breakdown'] = sorted(top_level, key=lambda e: e['cumulative_us'], reverse=True)[:top]
+    return result
+
+
+def print_report(result: Dict[str, Any]) -> None:
+    print(f"== {result['handler']}")
+    if 'error' in result:
+        print(f"  error: {result['error']}")
+        return
+    print(f"  module import:      {result['import_ms']:8.2f} ms ({result['modules_loaded']} modules in sys.modules)")
+    if 'warmup_ms' in result:
+        print(f"  warmup():           {result['warmup_ms']:8.2f} ms")
+    print(f"  first OPTIONS:      {result['options_ms']:8.2f} ms")
+    if 'first_request_ms' in result:
+        print(f"  first DB request:   {result['first_request_ms']:8.2f} ms (status {result['first_request_status']})")
+    print('  slowest imports (cumulative, -X importtime):')
+    for entry in result['import_breakdown']:
+        print(f"    {entry['cumulative_us'] / 1000:8.2f} ms  {entry['name']}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Cold-start import and first-request latency per handler')
+    parser.add_argument('--handler', action='append', choices=sorted(PROBE_EVENTS))
+    parser.add_argument('--top', type=int, default=10)
+    parser.add_argument('--warmup', action='store_true', help='call warmup() before the first request')
+    parser.add_argument('--json', action='store_true', help='print raw JSON results')
+    args = parser.parse_args(argv)
+
+    results = [measure(name, args.warmup, args.top) for name in (args.handler or sorted(PROBE_EVENTS))]
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        for result in results:
+            print_report(result)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,371 @@
+"""
+Business: Apply db_migrations/V####__*.sql with version tracking, online index builds and batched backfills
+Args: status | up [--target N] [--dry-run] | baseline --to N; --dsn (default DATABASE_URL)
+Returns: Per-step duration, lock wait and retry report on stdout
+
+Index builds are rewritten to CREATE INDEX CONCURRENTLY and run outside a transaction.
+Secrets a migration needs come from the environment as app.* settings (SESSION_SETTINGS).
+An UPDATE preceded by "-- migrate:batch key=id size=5000" is applied in key-range chunks,
+one short transaction per chunk; the file itself stays valid SQL for external appliers.
+"""
+import argparse
+import hashlib
+import os
+import re
+import sys
+import threading
+import time
+from typing import Dict, Any, List, Optional, Tuple
+import psycopg2
+import psycopg2.errors
+
+SCHEMA = 't_p68014762_remove_login_system'
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'db_migrations')
+FILE_PATTERN = re.compile(r'^V(\d+)__(.+)\.sql$')
+INDEX_PATTERN = re.compile(r'^\s*CREATE\s+(UNIQUE\s+)?INDEX\s+(?!CONCURRENTLY)', re.IGNORECASE)
+INDEX_NAME_PATTERN = re.compile(
+    r'^\s*CREATE\s+(?:UNIQUE\s+)?INDEX\s+(?:CONCURRENTLY\s+)?(?:IF\s+NOT\s+EXISTS\s+)?("?[\w.]+"?)',
+    re.IGNORECASE
+)
+BATCH_DIRECTIVE = re.compile(r'--\s*migrate:batch\b([^\n]*)')
+UPDATE_TABLE_PATTERN = re.compile(r'^\s*UPDATE\s+([\w."]+)', re.IGNORECASE)
+
+LOCK_TIMEOUT = '5s'
+LOCK_RETRIES = 5
+# migrations read secrets through current_setting() instead of embedding them in the SQL files
+SESSION_SETTINGS = {'app.unsubscribe_secret': 'UNSUBSCRIBE_SECRET'}
+
+
+def split_statements(sql: str) -> List[str]:
+    statements, current, i = [], [], 0
+    while i < len(sql):
+        ch = sql[i]
+        if sql.startswith('--', i):
+            end = sql.find('\n', i)
+            end = len(sql) if end == -1 else end + 1
+            current.append(sql[i:end])
+            i = end
+        elif sql.startswith('/*', i):
+            end = sql.find('*/', i + 2)
+            end = len(sql) if end == -1 else end + 2
+            current.append(sql[i:end])
+            i = end
+        elif ch in ("'", '"'):
+            end = i + 1
+            while end < len(sql):
+                if sql[end] == ch and sql[end + 1:end + 2] == ch:
+                    end += 2
+                elif sql[end] == ch:
+                    break
+                else:
+                    end += 1
+            current.append(sql[i:end + 1])
+            i = end + 1
+        elif ch == '$' and re.match(r'\$\w*\$', sql[i:]):
+            tag = re.match(r'\$\w*\$', sql[i:]).group(0)
+            end = sql.find(tag, i + len(tag))
+            end = len(sql) if end == -1 else end + len(tag)
+            current.append(sql[i:end])
+            i = end
+        elif ch == ';':
+            statements.append(''.join(current))
+            current = []
+            i += 1
+        else:
+            current.append(ch)
+            i += 1
+    statements.append(''.join(current))
+    return [s.strip() for s in statements if strip_comments(s).strip()]
+
+
+def strip_comments(statement: str) -> str:
+    return re.sub(r'--[^\n]*', '', statement)
+
+
+def plan_steps(sql: str, concurrent_indexes: bool) -> List[Dict[str, Any]]:
+    steps = []
+    for statement in split_statements(sql):
+        body = strip_comments(statement).strip()
+        directive = BATCH_DIRECTIVE.search(statement)
+        if directive and UPDATE_TABLE_PATTERN.match(body):
+            options = dict(re.findall(r'(\w+)=(\w+)', directive.group(1)))
+            steps.append({
+                'kind': 'batch',
+                'sql': body,
+                'key': options.get('key', 'id'),
+                'size': int(options.get('size', '5000'))
+            })
+        elif INDEX_PATTERN.match(body) and concurrent_indexes:
+            steps.append({
+                'kind': 'index',
+                'sql': INDEX_PATTERN.sub(lambda m: f"CREATE {m.group(1) or ''}INDEX CONCURRENTLY ", body, count=1)
+            })
+        elif re.match(r'^\s*CREATE\s+(UNIQUE\s+)?INDEX\s+CONCURRENTLY', body, re.IGNORECASE):
+            steps.append({'kind': 'index', 'sql': body})
+        elif steps and steps[-1]['kind'] == 'transaction':
+            steps[-1]['statements'].append(body)
+        else:
+            steps.append({'kind': 'transaction', 'statements': [body]})
+    return steps
+
+
+def load_migrations() -> List[Dict[str, Any]]:
+    migrations = []
+    for filename in sorted(os.listdir(MIGRATIONS_DIR)):
+        match = FILE_PATTERN.match(filename)
+        if not match:
+            continue
+        with open(os.path.join(MIGRATIONS_DIR, filename), encoding='utf-8') as f:
+            sql = f.read()
+        migrations.append({
+            'version': int(match.group(1)),
+            'name': match.group(2),
+            'filename': filename,
+            'sql': sql,
+            'checksum': hashlib.sha256(sql.encode()).hexdigest()
+        })
+    return migrations
+
+
+class LockWaitMonitor(threading.Thread):
+    """Samples pg_stat_activity from a side connection and accumulates time the worker spends waiting on locks."""
+
+    def __init__(self, dsn: str, pid: int, interval: float = 0.05):
+        super().__init__(daemon=True)
+        self.conn = psycopg2.connect(dsn)
+        self.conn.autocommit = True
+        self.pid = pid
+        self.interval = interval
+        self.waited = 0.0
+        self.stopped = threading.Event()
+
+    def run(self) -> None:
+        cursor = self.conn.cursor()
+        while not self.stopped.wait(self.interval):
+            cursor.execute('SELECT wait_event_type FROM pg_stat_activity WHERE pid = %s', (self.pid,))
+            row = cursor.fetchone()
+            if row and row[0] == 'Lock':
+                self.waited += self.interval
+        cursor.close()
+
+    def stop(self) -> None:
+        self.stopped.set()
+        self.join()
+        self.conn.close()
+
+
+def with_lock_retries(conn, fn) -> Tuple[Any, int]:
+    retries = 0
+    while True:
+        try:
+            return fn(), retries
+        except psycopg2.errors.LockNotAvailable:
+            conn.rollback()
+            retries += 1
+            if retries > LOCK_RETRIES:
+                raise
+            time.sleep(min(0.5 * 2 ** retries, 10))
+
+
+def run_transaction(conn, statements: List[str]) -> int:
+    cursor = conn.cursor()
+    cursor.execute(f"SET LOCAL lock_timeout = '{LOCK_TIMEOUT}'")
+    rows = 0
+    for statement in statements:
+        cursor.execute(statement)
+        rows += max(cursor.rowcount, 0)
+    conn.commit()
+    cursor.close()
+    return rows
+
+
+def run_index(conn, sql: str) -> int:
+    name = INDEX_NAME_PATTERN.match(sql).group(1).strip('"')
+    conn.autocommit = True
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f"SET lock_timeout = '{LOCK_TIMEOUT}'")
+        cursor.execute(
+            """SELECT c.oid::regclass::text FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid
+               WHERE c.relname = %s AND NOT i.indisvalid""",
+            (name.split('.')[-1],)
+        )
+        invalid = cursor.fetchone()
+        if invalid:
+            cursor.execute(f'DROP INDEX CONCURRENTLY IF EXISTS {invalid[0]}')
+        cursor.execute(sql)
+        cursor.execute('RESET lock_timeout')
+    finally:
+        cursor.close()
+        conn.autocommit = False
+    return 0
+
+
+def run_batches(conn, step: Dict[str, Any], report) -> Tuple[int, int, int]:
+    table = UPDATE_TABLE_PATTERN.match(step['sql']).group(1)
+    key, size = step['key'], step['size']
+    cursor = conn.cursor()
+    cursor.execute(f'SELECT MIN({key}), MAX({key}) FROM {table}')
+    low, high = cursor.fetchone()
+    conn.commit()
+    if low is None:
+        return 0, 0, 0
+
+    sql = step['sql'].rstrip(';').replace('%', '%%')
+    joiner = ' AND ' if re.search(r'\bWHERE\b', sql, re.IGNORECASE) else ' WHERE '
+    chunk_sql = f'{sql}{joiner}{key} >= %s AND {key} < %s'
+    rows = batches = retries = 0
+    for start in range(low, high + 1, size):
+        def chunk() -> int:
+            cursor.execute(f"SET LOCAL lock_timeout = '{LOCK_TIMEOUT}'")
+            cursor.execute(chunk_sql, (start, start + size))
+            count = cursor.rowcount
+            conn.commit()
+            return count
+        count, chunk_retries = with_lock_retries(conn, chunk)
+        rows += count
+        retries += chunk_retries
+        batches += 1
+        report(f'    batch {batches}: {key} [{start}, {start + size}) -> {count} rows')
+    cursor.close()
+    return rows, batches, retries
+
+
+def apply_session_settings(conn) -> None:
+    cursor = conn.cursor()
+    for setting, variable in SESSION_SETTINGS.items():
+        if os.environ.get(variable):
+            cursor.execute('SELECT set_config(%s, %s, false)', (setting, os.environ[variable]))
+    conn.commit()
+    cursor.close()
+
+
+def ensure_tracking_table(conn) -> None:
+    cursor = conn.cursor()
+    cursor.execute(f'CREATE SCHEMA IF NOT EXISTS {SCHEMA}')
+    cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS {SCHEMA}.schema_migrations (
+            version INTEGER PRIMARY KEY,
+            name VARCHAR(255) NOT NULL,
+            checksum VARCHAR(64) NOT NULL,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            duration_ms NUMERIC(12, 1)
+        )
+    """)
+    conn.commit()
+    cursor.close()
+
+
+def applied_versions(conn) -> Dict[int, str]:
+    cursor = conn.cursor()
+    cursor.execute(f'SELECT version, checksum FROM {SCHEMA}.schema_migrations')
+    rows = dict(cursor.fetchall())
+    conn.commit()
+    cursor.close()
+    return rows
+
+
+def record(conn, migration: Dict[str, Any], duration_ms: Optional[float]) -> None:
+    cursor = conn.cursor()
+    cursor.execute(
+        f"""INSERT INTO {SCHEMA}.schema_migrations (version, name, checksum, duration_ms)
+            VALUES (%s, %s, %s, %s) ON CONFLICT (version) DO NOTHING""",
+        (migration['version'], migration['name'], migration['checksum'], duration_ms)
+    )
+    conn.commit()
+    cursor.close()
+
+
+def apply_migration(conn, dsn: str, migration: Dict[str, Any], concurrent_indexes: bool) -> float:
+    steps = plan_steps(migration['sql'], concurrent_indexes)
+    monitor = LockWaitMonitor(dsn, conn.get_backend_pid())
+    monitor.start()
+    started = time.perf_counter()
+    try:
+        for number, step in enumerate(steps, 1):
+            step_started = time.perf_counter()
+            waited_before = monitor.waited
+            if step['kind'] == 'transaction':
+                rows, retries = with_lock_retries(conn, lambda: run_transaction(conn, step['statements']))
+                detail = f"{len(step['statements'])} statement(s), {rows} rows"
+            elif step['kind'] == 'index':
+                _, retries = with_lock_retries(conn, lambda: run_index(conn, step['sql']))
+                detail = 'concurrent index build'
+            else:
+                rows, batches, retries = run_batches(conn, step, print)
+                detail = f'{batches} batch(es) of {step["size"]}, {rows} rows'
+            print(
+                f'  step {number} [{step["kind"]}] {detail}: '
+                f'{(time.perf_counter() - step_started) * 1000:.1f} ms, '
+                f'lock wait ~{(monitor.waited - waited_before) * 1000:.0f} ms, retries {retries}'
+            )
+    finally:
+        monitor.stop()
+    return (time.perf_counter() - started) * 1000
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Apply db_migrations with version tracking')
+    parser.add_argument('command', choices=['status', 'up', 'baseline'])
+    parser.add_argument('--target', type=int, help='apply up to and including this version')
+    parser.add_argument('--to', type=int, help='baseline: mark versions up to N as applied without running them')
+    parser.add_argument('--dry-run', action='store_true', help='print the planned steps only')
+    parser.add_argument('--no-concurrent-index', action='store_true', help='keep plain CREATE INDEX inside transactions')
+    parser.add_argument('--dsn', default=os.environ.get('DATABASE_URL'))
+    args = parser.parse_args(argv)
+
+    migrations = load_migrations()
+    concurrent_indexes = not args.no_concurrent_index
+
+    if args.dry_run:
+        for migration in migrations:
+            if args.target is not None and migration['version'] > args.target:
+                break
+            print(f"V{migration['version']:04d} {migration['name']}")
+            for step in plan_steps(migration['sql'], concurrent_indexes):
+                sql = step.get('sql') or '; '.join(step['statements'])
+                print(f"  [{step['kind']}] {' '.join(sql.split())[:120]}")
+        return 0
+
+    if not args.dsn:
+        print('DATABASE_URL is not set and --dsn was not given', file=sys.stderr)
+        return 2
+
+    conn = psycopg2.connect(args.dsn, options=f'-c search_path={SCHEMA},public')
+    try:
+        apply_session_settings(conn)
+        ensure_tracking_table(conn)
+        applied = applied_versions(conn)
+
+        if args.command == 'baseline':
+            if args.to is None:
+                print('baseline requires --to N', file=sys.stderr)
+                return 2
+            for migration in migrations:
+                if migration['version'] <= args.to and migration['version'] not in applied:
+                    record(conn, migration, None)
+                    print(f"baselined V{migration['version']:04d} {migration['name']}")
+            return 0
+
+        for migration in migrations:
+            version = migration['version']
+            if version in applied:
+                state = 'applied' if applied[version] == migration['checksum'] else 'applied (checksum changed!)'
+            else:
+                state = 'pending'
+            if args.command == 'status':
+                print(f"V{version:04d} {migration['name']}: {state}")
+                continue
+            if version in applied or (args.target is not None and version > args.target):
+                continue
+            print(f"V{version:04d} {migration['name']}")
+            duration_ms = apply_migration(conn, args.dsn, migration, concurrent_indexes)
+            record(conn, migration, round(duration_ms, 1))
+            print(f'  done in {duration_ms:.1f} ms')
+    finally:
+        conn.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,96 @@
+"""
+Business: Purge abandoned unverified registrations in bounded chunks (run from cron or a scheduled job)
+Args: --grace-hours H after the verification code expired, --batch-size N, --pause S between chunks, --max-batches N, --dry-run; --dsn (default DATABASE_URL)
+Returns: Per-chunk progress, then total rows deleted and rows/sec on stdout
+
+Only rows created by register and never verified are eligible: verification_code still set, code expired
+more than the grace period ago, and no sessions or donations. Accounts from before email verification
+existed (verification_code NULL) are never touched. Each chunk is one short transaction that skips rows
+locked by a concurrent verify_email/register.
+"""
+import argparse
+import os
+import sys
+import time
+from typing import List, Optional
+import psycopg2
+
+SCHEMA = 't_p68014762_remove_login_system'
+
+ELIGIBLE = f"""FROM {SCHEMA}.users u
+    WHERE u.email_verified = FALSE AND u.verification_code IS NOT NULL
+        AND u.verification_code_expires < NOW() - %s * INTERVAL '1 hour'
+        AND NOT EXISTS (SELECT 1 FROM {SCHEMA}.sessions s WHERE s.user_id = u.id)
+        AND NOT EXISTS (SELECT 1 FROM {SCHEMA}.donations d WHERE d.user_id = u.id)"""
+
+REAP_SQL = f"""DELETE FROM {SCHEMA}.users WHERE id IN (
+    SELECT u.id {ELIGIBLE}
+    ORDER BY u.verification_code_expires
+    LIMIT %s
+    FOR UPDATE OF u SKIP LOCKED
+)"""
+
+
+def count_eligible(conn, grace_hours: float) -> int:
+    cursor = conn.cursor()
+    cursor.execute(f'SELECT COUNT(*) {ELIGIBLE}', (grace_hours,))
+    count = cursor.fetchone()[0]
+    conn.commit()
+    cursor.close()
+    return count
+
+
+def reap(conn, grace_hours: float, batch_size: int, pause: float, max_batches: Optional[int], report) -> int:
+    eligible = count_eligible(conn, grace_hours)
+    report(f'{eligible} unverified registrations older than {grace_hours:g}h past code expiry')
+    cursor = conn.cursor()
+    started = time.perf_counter()
+    deleted = batches = 0
+    while max_batches is None or batches < max_batches:
+        cursor.execute(REAP_SQL, (grace_hours, batch_size))
+        count = cursor.rowcount
+        conn.commit()
+        if count <= 0:
+            break
+        deleted += count
+        batches += 1
+        elapsed = time.perf_counter() - started
+        report(f'  batch {batches}: {count} rows, {deleted}/{eligible} '
+               f'({deleted / eligible * 100 if eligible else 100:.1f}%), {deleted / elapsed:,.0f} rows/sec')
+        if count < batch_size:
+            break
+        time.sleep(pause)
+    cursor.close()
+    return deleted
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Purge abandoned unverified registrations')
+    parser.add_argument('--grace-hours', type=float, default=float(os.environ.get('UNVERIFIED_GRACE_HOURS', '72')))
+    parser.add_argument('--batch-size', type=int, default=1000, help='rows deleted per transaction')
+    parser.add_argument('--pause', type=float, default=0.1, help='seconds to sleep between chunks')
+    parser.add_argument('--max-batches', type=int, help='stop after this many chunks (resume on the next run)')
+    parser.add_argument('--dry-run', action='store_true', help='only count eligible rows')
+    parser.add_argument('--dsn', default=os.environ.get('DATABASE_URL'))
+    args = parser.parse_args(argv)
+
+    if not args.dsn:
+        print('DATABASE_URL is not set and --dsn was not given', file=sys.stderr)
+        return 2
+
+    conn = psycopg2.connect(args.dsn)
+    try:
+        if args.dry_run:
+            print(f'{count_eligible(conn, args.grace_hours)} rows would be deleted')
+            return 0
+        started = time.perf_counter()
+        deleted = reap(conn, args.grace_hours, args.batch_size, args.pause, args.max_batches, print)
+        elapsed = time.perf_counter() - started
+        print(f'deleted {deleted} rows in {elapsed:.2f}s')
+    finally:
+        conn.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
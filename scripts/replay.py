@@ -0,0 +1,288 @@
+"""
+Business: Replay captured handler traffic (CAPTURE_FILE JSONL) against the handlers with a local Postgres and SMTP sink
+Args: capture files; --speed X (2 = twice the captured rate, 0 = as fast as possible), --concurrency N, --handler name (repeatable), --limit N, --seed, --dsn
+Returns: Per handler/action status counts and replayed vs captured latency percentiles, plus achieved rate and schedule lag
+
+Events are sent in capture order at their original offsets divided by --speed. Captures are pseudonymized
+(emails, tokens) and redacted (passwords, codes, admin key). Redacted passwords and admin keys are replayed as
+REPLAY_PASSWORD / REPLAY_ADMIN_KEY, and --seed inserts verified users for the captured emails (password
+REPLAY_PASSWORD) and a session for every captured X-Auth-Token; without it those requests replay as misses.
+Mail goes to an in-process SMTP sink with STARTTLS disabled.
+"""
+import argparse
+import json
+import math
+import os
+import socketserver
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from handler_loader import HANDLER_NAMES, load_handler, unsubscribe_token_hash
+
+SCHEMA = 't_p68014762_remove_login_system'
+REPLAY_PASSWORD = 'replay-password'
+REPLAY_ADMIN_KEY = 'replay-admin-key'
+REPLAY_UNSUBSCRIBE_SECRET = 'replay-unsubscribe-secret'
+
+
+class SmtpSession(socketserver.StreamRequestHandler):
+    def reply(self, line: str) -> None:
+        self.wfile.write(f'{line}\r\n'.encode())
+
+    def handle(self) -> None:
+        self.reply('220 replay-sink ESMTP')
+        while True:
+            line = self.rfile.readline().decode('utf-8', 'replace').strip()
+            if not line:
+                return
+            command = line.split(' ', 1)[0].upper()
+            if command == 'EHLO':
+                self.reply('250-replay-sink')
+                self.reply('250 AUTH PLAIN LOGIN')
+            elif command == 'AUTH':
+                if line.upper() == 'AUTH LOGIN':
+                    for prompt in ('VXNlcm5hbWU6', 'UGFzc3dvcmQ6'):
+                        self.reply(f'334 {prompt}')
+                        self.rfile.readline()
+                self.reply('235 Authentication successful')
+            elif command == 'DATA':
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                while self.rfile.readline() not in (b'.\r\n', b'.\n', b''):
+                    pass
+                with self.server.lock:
+                    self.server.messages += 1
+                self.reply('250 Queued')
+            elif command == 'QUIT':
+                self.reply('221 Bye')
+                return
+            elif command == 'STARTTLS':
+                self.reply('454 TLS not available')
+            elif command in ('HELO', 'MAIL', 'RCPT', 'RSET', 'NOOP'):
+                self.reply('250 OK')
+            else:
+                self.reply('502 Command not implemented')
+
+
+class SmtpSink(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self) -> None:
+        super().__init__(('127.0.0.1', 0), SmtpSession)
+        self.lock = threading.Lock()
+        self.messages = 0
+
+
+def load_capture(paths: List[str], handlers: Optional[List[str]], limit: Optional[int]) -> List[Dict[str, Any]]:
+    records = []
+    for path in paths:
+        with open(path, encoding='utf-8') as source:
+            for line in source:
+                if line.strip():
+                    record = json.loads(line)
+                    if record['handler'] in HANDLER_NAMES and (not handlers or record['handler'] in handlers):
+                        records.append(record)
+    records.sort(key=lambda record: record['at'])
+    return records[:limit] if limit else records
+
+
+def restore_credentials(event: Dict[str, Any], redacted: str) -> Dict[str, Any]:
+    headers = {
+        name: REPLAY_ADMIN_KEY if name.lower() == 'x-admin-key' and value == redacted else value
+        for name, value in (event.get('headers') or {}).items()
+    }
+    body = event.get('body') or ''
+    try:
+        data = json.loads(body) if body else None
+    except ValueError:
+        data = None
+    if isinstance(data, dict) and data.get('password') == redacted:
+        body = json.dumps({**data, 'password': REPLAY_PASSWORD})
+    return {**event, 'headers': headers, 'body': body}
+
+
+def action_of(event: Dict[str, Any]) -> str:
+    if event.get('warmup'):
+        return 'warmup'
+    try:
+        body = json.loads(event.get('body') or '{}')
+    except ValueError:
+        body = {}
+    action = body.get('action') if isinstance(body, dict) else None
+    return str(action or event.get('httpMethod', 'GET').lower())
+
+
+def seed_database(dsn: str, records: List[Dict[str, Any]], password_hash: str) -> Tuple[int, int]:
+    import psycopg2
+    from psycopg2.extras import execute_values
+    emails: Dict[str, bool] = {}
+    tokens: List[str] = []
+    for record in records:
+        event = record['event']
+        for name, value in (event.get('headers') or {}).items():
+            if name.lower() == 'x-auth-token' and value not in tokens:
+                tokens.append(value)
+        try:
+            body = json.loads(event.get('body') or '{}')
+        except ValueError:
+            continue
+        if not isinstance(body, dict):
+            continue
+        for email in ([body.get('email')] + list(body.get('emails') or [])):
+            # an address first seen in register must not exist yet, or the replayed register fails
+            if isinstance(email, str) and email not in emails:
+                emails[email] = body.get('action') != 'register'
+
+    now = datetime.now()
+    users = [(email, password_hash) for email, seed in emails.items() if seed]
+    users += [(f'session{i}@replay.invalid', password_hash) for i in range(len(tokens))]
+    conn = psycopg2.connect(dsn)
+    try:
+        cursor = conn.cursor()
+        inserted = execute_values(
+            cursor,
+            f"""INSERT INTO {SCHEMA}.users (email, password_hash, email_verified, subscribed_to_updates)
+                VALUES %s ON CONFLICT (email) DO NOTHING RETURNING id""",
+            users, template='(%s, %s, TRUE, TRUE)', page_size=len(users) or 1, fetch=True
+        )
+        if inserted:
+            execute_values(
+                cursor,
+                f"""UPDATE {SCHEMA}.users u SET unsubscribe_token_hash = v.token_hash
+                    FROM (VALUES %s) v (id, token_hash) WHERE u.id = v.id""",
+                [(user_id, unsubscribe_token_hash(user_id)) for (user_id,) in inserted],
+                page_size=len(inserted)
+            )
+        execute_values(
+            cursor,
+            f"""INSERT INTO {SCHEMA}.sessions (user_id, token, expires_at)
+                SELECT u.id, s.token, s.expires_at FROM (VALUES %s) s (email, token, expires_at)
+                JOIN {SCHEMA}.users u ON u.email = s.email
+                ON CONFLICT (token) DO NOTHING""",
+            [(f'session{i}@replay.invalid', token, now + timedelta(days=30)) for i, token in enumerate(tokens)],
+            template='(%s, %s, %s::timestamp)'
+        )
+        conn.commit()
+        cursor.close()
+    finally:
+        conn.close()
+    return len(users), len(tokens)
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+def replay(records: List[Dict[str, Any]], speed: float, concurrency: int) -> Tuple[List[Dict[str, Any]], float]:
+    modules = {name: load_handler(name) for name in sorted({record['handler'] for record in records})}
+    results: List[Dict[str, Any]] = []
+    results_lock = threading.Lock()
+
+    def run(record: Dict[str, Any], scheduled: float) -> None:
+        started = time.perf_counter()
+        try:
+            response = modules[record['handler']].handler(dict(record['event']), None)
+            for _ in response.get('bodyChunks') or ():
+                pass
+            status = str(response['statusCode'])
+        except Exception as e:
+            print(f"{record['handler']} raised {e!r}", file=sys.stderr)
+            status = 'exception'
+        latency_ms = (time.perf_counter() - started) * 1000
+        with results_lock:
+            results.append({
+                'key': f"{record['handler']}.{action_of(record['event'])}",
+                'status': status,
+                'latency_ms': latency_ms,
+                'captured_ms': record.get('duration_ms'),
+                'lag_ms': max(0.0, (started - scheduled) * 1000)
+            })
+
+    first_at = records[0]['at']
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for record in records:
+            scheduled = started + ((record['at'] - first_at) / speed if speed > 0 else 0.0)
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            pool.submit(run, record, scheduled)
+    return results, time.perf_counter() - started
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Replay captured handler traffic')
+    parser.add_argument('captures', nargs='+', help='JSONL files written by handlers with CAPTURE_FILE set')
+    parser.add_argument('--speed', type=float, default=1.0, help='rate multiplier; 0 sends as fast as possible')
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--handler', action='append', choices=HANDLER_NAMES)
+    parser.add_argument('--limit', type=int)
+    parser.add_argument('--seed', action='store_true', help='insert users and sessions for the captured identities')
+    parser.add_argument('--dsn', default=os.environ.get('DATABASE_URL'), help='local Postgres; never a production DSN')
+    args = parser.parse_args(argv)
+
+    if not args.dsn:
+        print('DATABASE_URL is not set and --dsn was not given', file=sys.stderr)
+        return 2
+    records = load_capture(args.captures, args.handler, args.limit)
+    if not records:
+        print('no captured events to replay', file=sys.stderr)
+        return 1
+
+    sink = SmtpSink()
+    threading.Thread(target=sink.serve_forever, daemon=True).start()
+    os.environ.pop('CAPTURE_FILE', None)
+    os.environ.update({
+        'DATABASE_URL': args.dsn,
+        'METRICS_LOG': '0',
+        'SMTP_HOST': '127.0.0.1',
+        'SMTP_PORT': str(sink.server_address[1]),
+        'SMTP_USER': 'replay',
+        'SMTP_PASSWORD': 'replay',
+        'SMTP_STARTTLS': '0'
+    })
+    os.environ['ADMIN_API_KEY'] = REPLAY_ADMIN_KEY
+    os.environ['UNSUBSCRIBE_SECRET'] = REPLAY_UNSUBSCRIBE_SECRET
+    auth = load_handler('auth')
+    for record in records:
+        record['event'] = restore_credentials(record['event'], auth.CAPTURE_REDACTED)
+
+    if args.seed:
+        users, sessions = seed_database(args.dsn, records, auth.hash_password(REPLAY_PASSWORD))
+        print(f'seeded {users} users, {sessions} sessions', file=sys.stderr)
+
+    captured_span = records[-1]['at'] - records[0]['at']
+    results, elapsed = replay(records, args.speed, args.concurrency)
+    sink.shutdown()
+
+    by_key: Dict[str, List[Dict[str, Any]]] = {}
+    for result in results:
+        by_key.setdefault(result['key'], []).append(result)
+    print(f'{"handler.action":<32} {"n":>6} {"p50 ms":>8} {"p90 ms":>8} {"p99 ms":>8} {"max ms":>8} '
+          f'{"cap p50":>8} {"cap p99":>8}  statuses')
+    for key, rows in sorted(by_key.items()):
+        latency = [row['latency_ms'] for row in rows]
+        captured = [row['captured_ms'] for row in rows if row['captured_ms'] is not None]
+        statuses: Dict[str, int] = {}
+        for row in rows:
+            statuses[row['status']] = statuses.get(row['status'], 0) + 1
+        print(f'{key:<32} {len(rows):>6} {percentile(latency, 0.5):>8.1f} {percentile(latency, 0.9):>8.1f} '
+              f'{percentile(latency, 0.99):>8.1f} {max(latency):>8.1f} {percentile(captured, 0.5):>8.1f} '
+              f'{percentile(captured, 0.99):>8.1f}  {" ".join(f"{code}:{n}" for code, n in sorted(statuses.items()))}')
+
+    lag = [result['lag_ms'] for result in results]
+    print(f'{len(results)} events in {elapsed:.2f}s ({len(results) / elapsed:,.1f}/s; captured span {captured_span:.2f}s, '
+          f'speed {args.speed:g}), schedule lag p50 {percentile(lag, 0.5):.1f} ms / p99 {percentile(lag, 0.99):.1f} ms, '
+          f'{sink.messages} emails to the sink')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
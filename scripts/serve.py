@@ -0,0 +1,227 @@
+"""
+Business: Self-hosted mode - serve all backend handlers from one process, with a Prometheus /metrics endpoint
+Args: --host, --port; requests to /<handler> (auth, account, donations, subscriptions) become platform events
+Returns: HTTP server running until interrupted; GET /metrics returns text exposition format 0.0.4
+
+Events carry 'streaming': True, so a handler may return an iterator of str in 'bodyChunks'
+(the account export does); it is sent with chunked transfer encoding as it is produced.
+"""
+import argparse
+import base64
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlsplit
+
+from handler_loader import HANDLER_NAMES, load_handler
+
+METRIC_PREFIX = 'app'
+STREAM_WRITE_TIMEOUT_SECONDS = 30
+
+COUNTER_FAMILIES: Dict[str, Tuple[str, Tuple[str, ...], str]] = {
+    'requests': ('requests_total', ('action', 'status'), 'Handler invocations by action and response status'),
+    'db_connections': ('db_connections_total', ('event',), 'Pooled database connection lifecycle events'),
+    'db_reads': ('db_reads_total', ('target',), 'Read-only requests by replica outcome (served, lagging, failed over)'),
+    'smtp_sends': ('smtp_sends_total', ('result',), 'Outgoing email attempts by result'),
+    'cache': ('cache_requests_total', ('cache', 'result'), 'Cache lookups by cache and hit/miss'),
+    'breaker_opened': ('breaker_opened_total', ('dependency',), 'Circuit breaker trips by dependency'),
+    'registrations': ('registrations_total', ('kind',), 'Registrations by new row or reclaimed abandoned unverified row'),
+    'admission': ('admission_total', ('event', 'priority'), 'Requests queued for or shed by admission control, by priority'),
+    'single_flight': ('single_flight_total', ('query', 'role'), 'Coalescible reads by query; shared ones reused a concurrent result'),
+    'validation': ('validation_total', ('result',), 'Request bodies refused before any dependency call'),
+    'compression': ('compression_total', ('encoding',), 'Compressed response bodies by content coding'),
+    'activity': ('activity_total', ('event',), 'Session activity updates recorded in process and flushed to the database'),
+}
+
+GAUGE_FAMILIES: Dict[str, Tuple[str, Tuple[str, ...], str]] = {
+    'db_pool_idle': ('db_pool_idle_connections', (), 'Idle pooled database connections'),
+    'db_connections_open': ('db_connections_open', (), 'Open database connections, idle or in use'),
+    'admission_active': ('admission_active', (), 'Requests holding an admission slot'),
+    'admission_queue_depth': ('admission_queue_depth', ('priority',), 'Requests waiting for an admission slot'),
+    'breaker_open': ('breaker_open', ('dependency',), '1 while the circuit breaker is open'),
+    'single_flight_coalescing_ratio': ('single_flight_coalescing_ratio', ('query',), 'Share of coalescible reads answered by an in-flight query'),
+}
+
+# event header names as the handlers look them up; names not listed here are sent Title-Cased
+CANONICAL_HEADERS = {
+    name.lower(): name
+    for name in ('X-Auth-Token', 'If-None-Match', 'X-Min-LSN', 'X-Admin-Key', 'Accept-Encoding', 'Content-Type')
+}
+
+
+def canonical_header(name: str) -> str:
+    return CANONICAL_HEADERS.get(name.lower()) or '-'.join(part.capitalize() for part in name.split('-'))
+
+
+def format_labels(pairs: List[Tuple[str, str]]) -> str:
+    escaped = []
+    for name, value in pairs:
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        escaped.append(f'{name}="{value}"')
+    return '{' + ','.join(escaped) + '}'
+
+
+def render_family(lines: List[str], families: Dict[str, Tuple[str, Tuple[str, ...], str]], kind: str,
+                  samples: Dict[str, List[Tuple[str, Tuple[str, ...], float]]]) -> None:
+    for key, rows in sorted(samples.items()):
+        if key not in families:
+            raise KeyError(f'{kind} family {key!r} is not registered in serve.py')
+        metric, label_names, help_text = families[key]
+        metric = f'{METRIC_PREFIX}_{metric}'
+        lines.append(f'# HELP {metric} {help_text}')
+        lines.append(f'# TYPE {metric} {kind}')
+        for handler_name, labels, value in rows:
+            if len(labels) != len(label_names):
+                raise ValueError(f'{kind} family {key!r} takes labels {label_names}, got {labels}')
+            lines.append(f'{metric}{format_labels([("handler", handler_name), *zip(label_names, labels)])} {value:g}')
+
+
+def render_metrics(snapshots: List[Dict[str, Any]]) -> str:
+    counters: Dict[str, List[Tuple[str, Tuple[str, ...], float]]] = {}
+    gauges: Dict[str, List[Tuple[str, Tuple[str, ...], float]]] = {}
+    for snapshot in snapshots:
+        for (name, *labels), value in sorted(snapshot['counters'].items()):
+            counters.setdefault(name, []).append((snapshot['handler'], tuple(labels), value))
+        for (name, *labels), value in sorted(snapshot['gauges'].items()):
+            gauges.setdefault(name, []).append((snapshot['handler'], tuple(labels), value))
+
+    lines: List[str] = []
+    render_family(lines, COUNTER_FAMILIES, 'counter', counters)
+    render_family(lines, GAUGE_FAMILIES, 'gauge', gauges)
+
+    metric = f'{METRIC_PREFIX}_request_duration_ms'
+    lines.append(f'# HELP {metric} Handler latency in milliseconds by action')
+    lines.append(f'# TYPE {metric} histogram')
+    for snapshot in snapshots:
+        bounds = [f'{bound:g}' for bound in snapshot['latency_buckets_ms']] + ['+Inf']
+        for action, histogram in sorted(snapshot['latency'].items()):
+            base = [('handler', snapshot['handler']), ('action', action)]
+            cumulative = 0
+            for bound, bucket_count in zip(bounds, histogram[:-1]):
+                cumulative += bucket_count
+                lines.append(f'{metric}_bucket{format_labels(base + [("le", bound)])} {cumulative}')
+            lines.append(f'{metric}_sum{format_labels(base)} {histogram[-1]:.3f}')
+            lines.append(f'{metric}_count{format_labels(base)} {cumulative}')
+    return '\n'.join(lines) + '\n'
+
+
+class HandlerRequest(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    handlers: Dict[str, Any] = {}
+
+    def do_GET(self) -> None:
+        self.dispatch()
+
+    def do_POST(self) -> None:
+        self.dispatch()
+
+    def do_OPTIONS(self) -> None:
+        self.dispatch()
+
+    def dispatch(self) -> None:
+        url = urlsplit(self.path)
+        name = url.path.strip('/')
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length).decode('utf-8') if length else ''
+
+        if name == 'metrics' and self.command == 'GET':
+            text = render_metrics([module.metrics_snapshot() for module in self.handlers.values()])
+            self.reply(200, {'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}, text.encode('utf-8'))
+            return
+
+        module = self.handlers.get(name)
+        if module is None:
+            self.reply(404, {'Content-Type': 'text/plain; charset=utf-8'}, b'Not found')
+            return
+
+        event = {
+            'httpMethod': self.command,
+            'headers': {canonical_header(name): value for name, value in self.headers.items()},
+            'queryStringParameters': dict(parse_qsl(url.query)),
+            'body': body,
+            'isBase64Encoded': False,
+            'streaming': True
+        }
+        response = module.handler(event, None)
+        if 'bodyChunks' in response:
+            self.reply_chunked(response['statusCode'], response.get('headers') or {}, response['bodyChunks'])
+            return
+        payload = response.get('body') or ''
+        if response.get('isBase64Encoded'):
+            data = base64.b64decode(payload)
+        else:
+            data = payload.encode('utf-8')
+        self.reply(response['statusCode'], response.get('headers') or {}, data)
+
+    def reply(self, status: int, headers: Dict[str, str], data: bytes) -> None:
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        if self.command != 'HEAD':
+            self.wfile.write(data)
+
+    def reply_chunked(self, status: int, headers: Dict[str, str], chunks: Any) -> None:
+        # a client that stops reading must not hold the handler's connection and snapshot open
+        self.connection.settimeout(STREAM_WRITE_TIMEOUT_SECONDS)
+        try:
+            self.send_response(status)
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.send_header('Transfer-Encoding', 'chunked')
+            self.end_headers()
+            for chunk in chunks:
+                data = chunk.encode('utf-8')
+                if data:
+                    self.wfile.write(b'%x\r\n%s\r\n' % (len(data), data))
+            self.wfile.write(b'0\r\n\r\n')
+        except Exception as e:
+            # headers are already sent; dropping the connection without the last chunk marks the body truncated
+            print(f'Streaming response aborted: {e}', file=sys.stderr)
+            self.close_connection = True
+        finally:
+            chunks.close()
+            self.connection.settimeout(None)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Serve all backend handlers from one process')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--log-invocations', action='store_true', help='keep the per-invocation metrics log line')
+    args = parser.parse_args(argv)
+
+    # identical queries (same SQL text and parameters) are coalesced across handlers, not just within one
+    flights, flights_lock = {}, threading.Lock()
+    for name in HANDLER_NAMES:
+        module = load_handler(name)
+        module.METRICS_LOG = args.log_invocations
+        module._flights = flights
+        module._flights_lock = flights_lock
+        HandlerRequest.handlers[name] = module
+    # register drops the new address from the other handlers' negative email caches
+    for module in HandlerRequest.handlers.values():
+        if hasattr(module, 'note_registered_email'):
+            HandlerRequest.handlers['auth'].EMAIL_REGISTERED_HOOKS.append(module.note_registered_email)
+
+    server = ThreadingHTTPServer((args.host, args.port), HandlerRequest)
+    print(f'Serving {", ".join(HANDLER_NAMES)} and /metrics on http://{args.host}:{args.port}', file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        for module in HandlerRequest.handlers.values():
+            if hasattr(module, 'flush_activity'):
+                module.flush_activity(force=True)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
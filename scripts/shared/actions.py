@@ -0,0 +1,2 @@
+def set_action(action: Any) -> None:
+    _invocation.action = action if action in ACTIONS else 'unknown'
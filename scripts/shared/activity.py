@@ -0,0 +1,68 @@
+ACTIVITY_INTERVAL_SECONDS = int(os.environ.get('ACTIVITY_INTERVAL_SECONDS', '300'))
+ACTIVITY_FLUSH_SECONDS = int(os.environ.get('ACTIVITY_FLUSH_SECONDS', '30'))
+SESSION_LIFETIME_DAYS = int(os.environ.get('SESSION_LIFETIME_DAYS', '30'))
+# Sliding expiration: the same batched write that records activity pushes a live session's expires_at
+# forward, so a session is renewed at most once per ACTIVITY_INTERVAL_SECONDS
+FLUSH_ACTIVITY_SQL = f"""WITH seen (token, user_id, seen_at) AS (VALUES %s),
+    touched AS (
+        UPDATE sessions s SET last_seen_at = seen.seen_at,
+            expires_at = GREATEST(s.expires_at, seen.seen_at + INTERVAL '{SESSION_LIFETIME_DAYS} days')
+        FROM seen
+        WHERE s.token = seen.token AND s.expires_at > NOW()
+            AND (s.last_seen_at IS NULL OR s.last_seen_at < seen.seen_at)
+    )
+    UPDATE t_p68014762_remove_login_system.users u SET last_seen_at = latest.seen_at
+    FROM (SELECT user_id, MAX(seen_at) AS seen_at FROM seen GROUP BY user_id) latest
+    WHERE u.id = latest.user_id AND (u.last_seen_at IS NULL OR u.last_seen_at < latest.seen_at)"""
+_activity: Dict[str, Tuple[int, datetime]] = {}
+_activity_recorded: Dict[str, float] = {}
+_activity_lock = threading.Lock()
+_activity_flushed_at = [time.monotonic()]
+
+
+def record_activity(token: str, user_id: int) -> None:
+    now = time.monotonic()
+    with _activity_lock:
+        if now - _activity_recorded.get(token, -ACTIVITY_INTERVAL_SECONDS) < ACTIVITY_INTERVAL_SECONDS:
+            return
+        _activity_recorded[token] = now
+        _activity[token] = (user_id, datetime.now())
+    count_event('activity', 'recorded')
+
+
+def flush_activity(force: bool = False) -> None:
+    now = time.monotonic()
+    with _activity_lock:
+        if not _activity or (not force and now - _activity_flushed_at[0] < ACTIVITY_FLUSH_SECONDS):
+            return
+        pending = [(token, user_id, seen_at) for token, (user_id, seen_at) in _activity.items()]
+        _activity.clear()
+        _activity_flushed_at[0] = now
+        for token, recorded_at in list(_activity_recorded.items()):
+            if now - recorded_at >= ACTIVITY_INTERVAL_SECONDS:
+                del _activity_recorded[token]
+    database_url = os.environ.get('DATABASE_URL')
+    if not database_url:
+        return
+    from psycopg2.extras import execute_values
+    try:
+        conn = get_connection(database_url)
+    except DependencyUnavailable as e:
+        print(f'Activity flush skipped ({len(pending)} sessions): {e}')
+        return
+    try:
+        cursor = conn.cursor()
+        execute_values(cursor, FLUSH_ACTIVITY_SQL, pending, template='(%s, %s::integer, %s::timestamp)', page_size=len(pending))
+        conn.commit()
+        cursor.close()
+        count_event('activity', 'flushed')
+    except Exception as e:
+        print(f'Activity flush error ({len(pending)} sessions): {e}')
+    finally:
+        release_connection(conn)
+
+
+atexit.register(flush_activity, True)
+
+
+AFTER_RESPONSE_HOOKS.append(flush_activity)
@@ -0,0 +1,131 @@
+NEGATIVE_CACHE_SIZE = int(os.environ.get('NEGATIVE_CACHE_SIZE', '10000'))
+NEGATIVE_CACHE_TTL_SECONDS = int(os.environ.get('NEGATIVE_CACHE_TTL_SECONDS', '60'))
+EMAIL_BLOOM_BYTES = int(os.environ.get('EMAIL_BLOOM_BYTES', '0'))
+EMAIL_BLOOM_FP_RATE = float(os.environ.get('EMAIL_BLOOM_FP_RATE', '0.01'))
+EMAIL_BLOOM_REFRESH_SECONDS = int(os.environ.get('EMAIL_BLOOM_REFRESH_SECONDS', '60'))
+_missing_emails: Dict[str, float] = OrderedDict()
+_missing_lock = threading.Lock()
+_email_bloom: Dict[str, Any] = {
+    'bits': None,
+    'size': EMAIL_BLOOM_BYTES * 8,
+    'hashes': max(1, round(-math.log2(EMAIL_BLOOM_FP_RATE))),
+    'capacity': int(EMAIL_BLOOM_BYTES * 8 * math.log(2) ** 2 / -math.log(EMAIL_BLOOM_FP_RATE)),
+    'count': 0,
+    'watermark': 0,
+    'refreshed_at': 0.0,
+    'refreshing': False
+}
+
+
+def bloom_positions(email: str) -> List[int]:
+    digest = hashlib.blake2b(email.encode(), digest_size=16).digest()
+    h1 = int.from_bytes(digest[:8], 'little')
+    h2 = int.from_bytes(digest[8:], 'little') | 1
+    size = _email_bloom['size']
+    return [(h1 + i * h2) % size for i in range(_email_bloom['hashes'])]
+
+
+def bloom_add(bits: bytearray, email: str) -> None:
+    for position in bloom_positions(email):
+        bits[position >> 3] |= 1 << (position & 7)
+
+
+def refresh_email_bloom() -> None:
+    try:
+        bits = _email_bloom['bits']
+        rebuild = bits is None
+        if rebuild:
+            bits = bytearray(EMAIL_BLOOM_BYTES)
+        watermark, added = _email_bloom['watermark'], 0
+        conn = get_connection(os.environ['DATABASE_URL'])
+        try:
+            cursor = conn.cursor(name='email_bloom')
+            cursor.itersize = 50000
+            cursor.execute(
+                "SELECT id, email FROM t_p68014762_remove_login_system.users WHERE id > %s",
+                (watermark,)
+            )
+            for row in cursor:
+                bloom_add(bits, row['email'])
+                watermark = max(watermark, row['id'])
+                added += 1
+            cursor.close()
+        finally:
+            release_connection(conn)
+        _email_bloom.update(bits=bits, watermark=watermark, count=_email_bloom['count'] + added,
+                            refreshed_at=time.monotonic())
+        if _email_bloom['count'] > _email_bloom['capacity']:
+            print(f"Email bloom filter over capacity ({_email_bloom['count']} > {_email_bloom['capacity']}), "
+                  'false-positive rate exceeds EMAIL_BLOOM_FP_RATE')
+    except Exception as e:
+        print(f'Email bloom refresh error: {e}')
+    finally:
+        _email_bloom['refreshing'] = False
+
+
+def bloom_excludes(email: str) -> bool:
+    if not EMAIL_BLOOM_BYTES:
+        return False
+    if not _email_bloom['refreshing'] and time.monotonic() - _email_bloom['refreshed_at'] > EMAIL_BLOOM_REFRESH_SECONDS:
+        _email_bloom['refreshing'] = True
+        threading.Thread(target=refresh_email_bloom, daemon=True).start()
+    bits = _email_bloom['bits']
+    # emails registered by other instances since the last refresh are not in the filter; once it is older
+    # than the negative cache would trust an answer, ask the database instead
+    if bits is None or time.monotonic() - _email_bloom['refreshed_at'] > NEGATIVE_CACHE_TTL_SECONDS:
+        return False
+    return not all(bits[position >> 3] & (1 << (position & 7)) for position in bloom_positions(email))
+
+
+def email_registered(email: str) -> bool:
+    conn = get_connection(os.environ['DATABASE_URL'])
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT 1 FROM t_p68014762_remove_login_system.users WHERE email = %s", (email,))
+        found = cursor.fetchone() is not None
+        cursor.close()
+    finally:
+        release_connection(conn)
+    return found
+
+
+def email_known_missing(email: str) -> bool:
+    if not email:
+        return False
+    cache = None
+    with _missing_lock:
+        expires_at = _missing_emails.get(email)
+        if expires_at is not None:
+            if expires_at > time.monotonic():
+                _missing_emails.move_to_end(email)
+                cache = 'negative_email'
+            else:
+                del _missing_emails[email]
+    if cache is None and bloom_excludes(email):
+        cache = 'email_bloom'
+    if cache is None:
+        count_event('cache', 'negative_email', 'miss')
+        return False
+    # a registration handled by another function instance does not reach this cache, so a negative answer
+    # is confirmed on the primary (one indexed lookup, no replica or action work) before it becomes a 404
+    if email_registered(email):
+        count_event('cache', cache, 'stale')
+        note_registered_email(email)
+        return False
+    count_event('cache', cache, 'hit')
+    return True
+
+
+def remember_missing_email(email: str) -> None:
+    with _missing_lock:
+        _missing_emails[email] = time.monotonic() + NEGATIVE_CACHE_TTL_SECONDS
+        _missing_emails.move_to_end(email)
+        while len(_missing_emails) > NEGATIVE_CACHE_SIZE:
+            _missing_emails.popitem(last=False)
+
+
+def note_registered_email(email: str) -> None:
+    with _missing_lock:
+        _missing_emails.pop(email, None)
+    if _email_bloom['bits'] is not None:
+        bloom_add(_email_bloom['bits'], email)
@@ -0,0 +1,34 @@
+# If-None-Match uses the weak comparison, and a tag the client got with a compressed body carries the
+# coding suffix added by compress_response: both name the same content as the identity tag
+def identity_etag(tag: str) -> str:
+    if tag.startswith('W/'):
+        tag = tag[2:]
+    for coding in ETAG_CODINGS:
+        if tag.endswith(f'-{coding}"'):
+            return f'{tag[:-len(coding) - 2]}"'
+    return tag
+
+
+def etag_matches(event: Dict[str, Any], etag: str) -> bool:
+    if_none_match = (event.get('headers') or {}).get('If-None-Match')
+    if not if_none_match:
+        return False
+    candidates = [identity_etag(tag.strip()) for tag in if_none_match.split(',')]
+    matched = '*' in candidates or etag in candidates
+    count_event('cache', 'etag', 'hit' if matched else 'miss')
+    return matched
+
+
+def not_modified_response(etag: str) -> Dict[str, Any]:
+    return {
+        'statusCode': 304,
+        'headers': {
+            'ETag': etag,
+            'Cache-Control': 'private, no-cache',
+            'Vary': 'X-Auth-Token',
+            'Access-Control-Allow-Origin': '*',
+            'Access-Control-Expose-Headers': 'ETag'
+        },
+        'isBase64Encoded': False,
+        'body': ''
+    }
@@ -0,0 +1,54 @@
+def hash_password(password: str) -> str:
+    return hashlib.sha256(password.encode()).hexdigest()
+
+
+def send_email(email: str, subject: str, text_content: str, html_content: str) -> bool:
+    smtp_host = os.environ.get('SMTP_HOST')
+    smtp_port = int(os.environ.get('SMTP_PORT', '587'))
+    smtp_user = os.environ.get('SMTP_USER')
+    smtp_password = os.environ.get('SMTP_PASSWORD')
+    sender_email = 'ruprojectgames@gmail.com'
+    
+    if not all([smtp_host, smtp_user, smtp_password]):
+        return False
+    
+    if not breaker_allows('smtp'):
+        print('Email send skipped: SMTP circuit open')
+        count_event('smtp_sends', 'skipped')
+        return False
+    
+    import smtplib
+    from email.mime.text import MIMEText
+    from email.mime.multipart import MIMEMultipart
+    
+    msg = MIMEMultipart('alternative')
+    msg['Subject'] = subject
+    msg['From'] = sender_email
+    msg['To'] = email
+    
+    part1 = MIMEText(text_content, 'plain')
+    part2 = MIMEText(html_content, 'html')
+    msg.attach(part1)
+    msg.attach(part2)
+    
+    try:
+        timeout = max(1, min(SMTP_TIMEOUT_MAX, remaining_seconds()))
+    except DependencyUnavailable:
+        print('Email send skipped: request deadline exceeded')
+        count_event('smtp_sends', 'skipped')
+        return False
+    
+    try:
+        with smtplib.SMTP(smtp_host, smtp_port, timeout=timeout) as server:
+            if os.environ.get('SMTP_STARTTLS', '1') != '0':
+                server.starttls()
+            server.login(smtp_user, smtp_password)
+            server.send_message(msg)
+        record_success('smtp')
+        count_event('smtp_sends', 'sent')
+        return True
+    except Exception as e:
+        record_failure('smtp')
+        count_event('smtp_sends', 'failed')
+        print(f'Email send error: {e}')
+        return False
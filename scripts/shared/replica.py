@@ -0,0 +1,43 @@
+REPLICA_MAX_WAIT_MS = int(os.environ.get('REPLICA_MAX_WAIT_MS', '200'))
+
+
+def get_read_connection(database_url: str, event: Dict[str, Any]) -> Tuple[Any, bool]:
+    replica_url = os.environ.get('DATABASE_REPLICA_URL')
+    if not replica_url or getattr(_invocation, 'replica_failed', False):
+        return get_connection(database_url), False
+    try:
+        conn = get_connection(replica_url, breaker='replica')
+    except DependencyUnavailable:
+        return get_connection(database_url), False
+    min_lsn = (event.get('headers') or {}).get('X-Min-LSN')
+    if not min_lsn or replica_caught_up(conn, min_lsn):
+        count_event('db_reads', 'replica')
+        return conn, True
+    count_event('db_reads', 'replica_lagging')
+    release_connection(conn)
+    return get_connection(database_url), False
+
+
+def replica_caught_up(conn: Any, min_lsn: str) -> bool:
+    deadline = time.monotonic() + REPLICA_MAX_WAIT_MS / 1000
+    cursor = conn.cursor()
+    try:
+        while True:
+            cursor.execute("SELECT pg_last_wal_replay_lsn() >= %s::pg_lsn AS caught_up", (min_lsn,))
+            if cursor.fetchone()['caught_up']:
+                return True
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.01)
+    except Exception:
+        conn.rollback()
+        return False
+    finally:
+        cursor.close()
+
+
+def write_lsn_headers(cursor: Any) -> Dict[str, str]:
+    if not os.environ.get('DATABASE_REPLICA_URL'):
+        return {}
+    cursor.execute("SELECT pg_current_wal_lsn()::text AS lsn")
+    return {'X-Write-LSN': cursor.fetchone()['lsn'], 'Access-Control-Expose-Headers': 'X-Write-LSN'}
@@ -0,0 +1,28 @@
+CONNECTION_MAX_AGE = 300
+POOL_MAX_IDLE = int(os.environ.get('DB_POOL_MAX_IDLE', '4'))
+DEFAULT_DEADLINE_MS = int(os.environ.get('REQUEST_DEADLINE_MS', '10000'))
+DEADLINE_RESERVE_MS = 250
+CONNECT_TIMEOUT_MAX = 5
+STATEMENT_TIMEOUT_MAX_MS = 5000
+SMTP_TIMEOUT_MAX = 10
+BREAKER_FAILURE_THRESHOLD = 5
+BREAKER_RESET_SECONDS = 30
+METRICS_LOG = os.environ.get('METRICS_LOG', '1') != '0'
+MAX_FIELD_LENGTH = 255
+COMPRESSION_MIN_BYTES = int(os.environ.get('COMPRESSION_MIN_BYTES', '1024'))
+GZIP_LEVEL = int(os.environ.get('GZIP_LEVEL', '6'))
+BROTLI_QUALITY = int(os.environ.get('BROTLI_QUALITY', '5'))
+STREAM_MAX_SECONDS = int(os.environ.get('STREAM_MAX_SECONDS', '300'))
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+ADMISSION_MAX_ACTIVE = int(os.environ.get('ADMISSION_MAX_ACTIVE', '8'))
+ADMISSION_QUEUE_MAX = int(os.environ.get('ADMISSION_QUEUE_MAX', '16'))
+ADMISSION_WAIT_MS = int(os.environ.get('ADMISSION_WAIT_MS', '250'))
+ADMISSION_RETRY_AFTER_SECONDS = 1
+PRIORITY_NAMES = ('high', 'normal', 'low')
+CAPTURE_FILE = os.environ.get('CAPTURE_FILE')
+CAPTURE_SAMPLE_RATE = float(os.environ.get('CAPTURE_SAMPLE_RATE', '1'))
+# pseudonyms match across instances only if they share CAPTURE_SALT
+CAPTURE_SALT = os.environ.get('CAPTURE_SALT') or secrets.token_hex(16)
+CAPTURE_HEADERS = ('content-type', 'accept-encoding', 'if-none-match')
+# passwords, codes and the admin key are replaced by this; scripts/replay.py substitutes its own credentials
+CAPTURE_REDACTED = '<redacted>'
@@ -0,0 +1,15 @@
+UNSUBSCRIBE_SECRET = os.environ.get('UNSUBSCRIBE_SECRET', '')
+if not UNSUBSCRIBE_SECRET:
+    # without it no token can be issued or checked, and every user would silently lose one-click unsubscribe
+    raise RuntimeError('UNSUBSCRIBE_SECRET is not set; it is required to issue and check unsubscribe tokens')
+
+
+def unsubscribe_token(user_id: int) -> str:
+    # derived from the user id rather than random, so it can be handed out again without rotating it;
+    # only its sha256 is stored (users.unsubscribe_token_hash)
+    digest = hmac.new(UNSUBSCRIBE_SECRET.encode(), f'unsubscribe:{user_id}'.encode(), hashlib.sha256).digest()
+    return base64.urlsafe_b64encode(digest).rstrip(b'=').decode('ascii')
+
+
+def hash_unsubscribe_token(token: Optional[str]) -> Optional[str]:
+    return hashlib.sha256(token.encode()).hexdigest() if token else None
@@ -0,0 +1,78 @@
+"""
+Business: Regenerate the infrastructure blocks the backend handlers share from their single source in scripts/shared
+Args: --check to only report out-of-date blocks (CI), without rewriting the handlers
+Returns: Exit 0 when every block matches its source; 1 on drift or a block naming an unknown section
+
+Each backend/<name>/index.py is deployed on its own, so the handlers cannot import a common module. The
+shared code is instead copied between '# --- shared: <section> ...' and '# --- end shared: <section> ---'
+markers; edit scripts/shared/<section>.py and run this script rather than editing a copy.
+"""
+import argparse
+import os
+import re
+import sys
+from typing import Any, Dict, List, Optional, Tuple
+
+from handler_loader import BACKEND_DIR, HANDLER_NAMES
+
+SHARED_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'shared')
+HEADER = '# --- shared: {name} (generated from scripts/shared/{name}.py by scripts/sync_shared.py; edit there) ---\n'
+FOOTER = '# --- end shared: {name} ---'
+BLOCK = re.compile(r'^# --- shared: (?P<name>\w+) .*?---\n(?P<body>.*?)^# --- end shared: (?P=name) ---$', re.M | re.S)
+
+
+def load_sections() -> Dict[str, str]:
+    sections = {}
+    for filename in sorted(os.listdir(SHARED_DIR)):
+        if filename.endswith('.py'):
+            with open(os.path.join(SHARED_DIR, filename), encoding='utf-8') as source:
+                sections[filename[:-3]] = source.read().strip('\n') + '\n'
+    return sections
+
+
+def sync(source: str, sections: Dict[str, str]) -> Tuple[str, List[str]]:
+    stale: List[str] = []
+
+    def regenerate(match: Any) -> str:
+        name = match.group('name')
+        if name not in sections:
+            raise KeyError(name)
+        block = HEADER.format(name=name) + sections[name] + FOOTER.format(name=name)
+        if block != match.group(0):
+            stale.append(name)
+        return block
+
+    return BLOCK.sub(regenerate, source), stale
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Sync the shared handler blocks from scripts/shared')
+    parser.add_argument('--check', action='store_true', help='report drift and exit 1 instead of rewriting')
+    args = parser.parse_args(argv)
+
+    sections = load_sections()
+    failed = False
+    for name in HANDLER_NAMES:
+        path = os.path.join(BACKEND_DIR, name, 'index.py')
+        with open(path, encoding='utf-8') as source:
+            text = source.read()
+        try:
+            updated, stale = sync(text, sections)
+        except KeyError as e:
+            print(f'{path}: unknown shared section {e.args[0]} (no scripts/shared/{e.args[0]}.py)', file=sys.stderr)
+            failed = True
+            continue
+        if not stale:
+            continue
+        if args.check:
+            print(f'{path}: out of date: {", ".join(stale)} (run scripts/sync_shared.py)', file=sys.stderr)
+            failed = True
+        else:
+            with open(path, 'w', encoding='utf-8') as target:
+                target.write(updated)
+            print(f'{path}: updated {", ".join(stale)}')
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())